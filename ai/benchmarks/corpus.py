@@ -0,0 +1,108 @@
+"""Gerador determinístico de feedbacks sintéticos em português para os benchmarks do serviço de IA.
+
+Usa o próprio vocabulário do serviço (léxicos do heatmap, dicas negativas e stopwords do lexicon.json)
+para que os textos exercitem os mesmos caminhos de matching que os feedbacks reais.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import random
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+import main
+
+OPENERS = [
+    "A coordenação",
+    "O professor",
+    "A secretaria",
+    "O atendimento",
+    "A turma",
+    "O laboratório",
+    "A biblioteca",
+    "O portal do aluno",
+    "A sala",
+    "A profa",
+]
+VERBS = ["foi", "é", "está", "ficou", "continua", "parece", "sempre foi", "nunca foi"]
+CONNECTORS = [",", "e", "mas", ", porém", ". Além disso", ". Também", "; no geral"]
+FILLERS = [
+    "na última semana",
+    "durante as aulas",
+    "no período da noite",
+    "desde o começo do semestre",
+    "com os alunos",
+    "pelo e-mail",
+    "no whatsapp",
+    "quando precisei",
+]
+NEGATIONS = ["não", "sem", "falta de", "nunca"]
+
+
+def _vocabulary() -> Dict[str, List[str]]:
+    lexicon = main.lexicons.current.data
+    positive = list(lexicon["positive"])
+    negative = list(lexicon["negative"]) + list(lexicon["negativeStrong"])
+    return {
+        "positive": positive,
+        "negative": negative + sorted(set(lexicon["negHints"])),
+        "neutral": sorted(set(lexicon["neutral"])),
+        "stop": sorted(set(lexicon["stopwords"])),
+    }
+
+
+def weeks(count: int, start: dt.date = dt.date(2025, 2, 3)) -> List[str]:
+    """Semanas no mesmo formato do backend (segunda-feira, yyyy-MM-dd)."""
+    monday = start - dt.timedelta(days=start.weekday())
+    return [(monday + dt.timedelta(weeks=i)).isoformat() for i in range(count)]
+
+
+def categories(count: int, rng: random.Random) -> List[Optional[str]]:
+    cats: List[Optional[str]] = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+    return cats + [None]
+
+
+def sentence(rng: random.Random, vocab: Dict[str, List[str]]) -> str:
+    parts = [rng.choice(OPENERS), rng.choice(VERBS)]
+    for i in range(rng.randint(1, 3)):
+        roll = rng.random()
+        if roll < 0.35:
+            parts.append(rng.choice(vocab["positive"]))
+        elif roll < 0.6:
+            parts.append(rng.choice(vocab["negative"]))
+        elif roll < 0.75:
+            parts.append(f"{rng.choice(NEGATIONS)} {rng.choice(vocab['positive'])}")
+        else:
+            parts.append(rng.choice(vocab["neutral"]))
+        parts.append(rng.choice(vocab["stop"]))
+        if i and rng.random() < 0.4:
+            parts.append(rng.choice(FILLERS))
+        if rng.random() < 0.3:
+            parts.append(rng.choice(CONNECTORS))
+    text = " ".join(parts).replace(" ,", ",").replace(" .", ".").replace(" ;", ";")
+    if rng.random() < 0.2:
+        text = text.upper()
+    return text + rng.choice([".", "!", "", "..."])
+
+
+def generate(size: int, seed: int = 42, n_weeks: int = 26, n_categories: int = 12) -> Iterator[Dict[str, Optional[str]]]:
+    """Gera `size` FeedbackText (como dicts) com texto, semana e categoria reprodutíveis pela seed."""
+    rng = random.Random(seed)
+    vocab = _vocabulary()
+    week_list = weeks(n_weeks)
+    cat_list = categories(n_categories, rng)
+    for i in range(size):
+        text = sentence(rng, vocab)
+        if rng.random() < 0.35:
+            text = f"{text} {sentence(rng, vocab)}"
+        yield {
+            "id": f"fb-{seed}-{i}",
+            "text": text,
+            "week": rng.choice(week_list),
+            "categoryId": rng.choice(cat_list),
+        }
+
+
+def corpus(size: int, seed: int = 42, **kwargs) -> List[Dict[str, Optional[str]]]:
+    return list(generate(size, seed=seed, **kwargs))
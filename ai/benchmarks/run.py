@@ -0,0 +1,354 @@
+"""Benchmarks dos caminhos quentes do serviço de IA.
+
+Uso (a partir de `ai/`):
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --out benchmarks/results/baseline.json
+    python -m benchmarks.run --sizes 1000,10000 --compare benchmarks/results/baseline.json
+
+Cada caso roda num processo filho (fork) para medir o pico de RSS isoladamente. O relatório traz vazão,
+latência p50/p99 e pico de RSS por função/rota; `--compare` aponta regressões acima da tolerância.
+As rotas usam o TestClient do FastAPI (requer httpx) e o /assistant roda sempre pelo fallback local.
+O armazém de resultados fica desligado: cada medição parte de caches vazios e o arquivo real não é tocado.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+# Antes do import de main: com o armazém ligado os resultados iriam para data/ai-results.sqlite3.
+os.environ["RESULT_STORE_PATH"] = ""
+
+import main
+from benchmarks import corpus as synth
+
+QUESTIONS = [
+    "Me dá um resumo dos últimos 30 dias",
+    "Como está o NPS?",
+    "Quais palavras mais aparecem nos comentários?",
+    "Qual categoria está mais crítica?",
+    "O que fazer para melhorar o atendimento?",
+    "oi, tudo bem?",
+    "Explique os dados",
+]
+
+# (latências em segundos, unidades processadas por medição)
+Samples = Tuple[List[float], int]
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _per_item(fn: Callable[[Any], Any], items: List[Any]) -> Samples:
+    lat: List[float] = []
+    clock = time.perf_counter
+    for it in items:
+        start = clock()
+        fn(it)
+        lat.append(clock() - start)
+    return lat, 1
+
+
+def fake_llm_outputs(texts: List[Dict[str, Any]], rng: random.Random) -> List[str]:
+    """Saídas no formato que o Gemini costuma devolver: JSON puro, com codefence ou com texto em volta."""
+    out = []
+    for row in texts:
+        body = json.dumps(
+            {"summary": row["text"][:80], "insights": [row["text"][:40]] * 3, "actions": [row["week"]]},
+            ensure_ascii=False,
+        )
+        style = rng.random()
+        if style < 0.4:
+            out.append(body)
+        elif style < 0.8:
+            out.append(f"```json\n{body}\n```")
+        else:
+            out.append(f"Claro! Segue a análise:\n{body}\nQualquer dúvida, é só falar.")
+    return out
+
+
+def assistant_context(rows: List[Dict[str, Any]]) -> main.AssistantContext:
+    """Contexto do /assistant montado a partir do corpus (como o backend faz com o /keywords)."""
+    kw = main.aggregate_keywords(main.KeywordRequest(texts=rows, top=32))
+    by_week: Dict[str, List[int]] = {}
+    for r in rows:
+        by_week.setdefault(r["week"], []).append(len(r["text"]) % 5 + 1)
+    weeks = sorted(by_week)
+    series = [main.SeriesPoint(bucket=w, avg=float(np.mean(by_week[w])), count=len(by_week[w])) for w in weeks]
+    volume = [main.SeriesPoint(bucket=w, total=len(by_week[w])) for w in weeks]
+    topics = [
+        main.TopicPolarity(topic=f"Categoria {i}", neg=10.0 + i, neu=5.0, pos=20.0 - i, pneg=(10.0 + i) / 35 * 100)
+        for i in range(8)
+    ]
+    worst = [main.WorstQuestion(question=f"Pergunta {i}", avg=2.0 + i / 10, total=50 + i) for i in range(5)]
+    return main.AssistantContext(
+        filters={"days": "30"},
+        kpis={"nps": 42.0, "totalFeedbacks": float(len(rows))},
+        series=series,
+        volume=volume,
+        topics=topics,
+        words_neg=kw.neg,
+        words_pos=kw.pos,
+        worst_questions=worst,
+    )
+
+
+def case_normalize(rows, args) -> Samples:
+    return _per_item(main.normalize, [r["text"] for r in rows])
+
+
+def case_extract_cold(rows, args) -> Samples:
+    main.extraction_cache.clear()
+    return _per_item(main.extract_from_text, [r["text"] for r in rows])
+
+
+def case_aggregate_cold(rows, args) -> Samples:
+    payload = main.KeywordRequest(texts=rows, top=40)
+    lat = []
+    for _ in range(args.repeats):
+        main.extraction_cache.clear()
+        lat.append(_timed(lambda: main.aggregate_keywords(payload)))
+    return lat, len(rows)
+
+
+def case_aggregate_warm(rows, args) -> Samples:
+    payload = main.KeywordRequest(texts=rows, top=40)
+    main.aggregate_keywords(payload)
+    return [_timed(lambda: main.aggregate_keywords(payload)) for _ in range(args.repeats)], len(rows)
+
+
+def case_parse_json(rows, args) -> Samples:
+    outputs = fake_llm_outputs(rows[: args.calls], random.Random(args.seed))
+    return _per_item(main.parse_json_tolerant, outputs)
+
+
+def case_build_answer(rows, args) -> Samples:
+    ctx = assistant_context(rows)
+    rng = random.Random(args.seed)
+    reqs = [main.AssistantRequest(question=rng.choice(QUESTIONS), context=ctx) for _ in range(args.calls)]
+    return _per_item(main.build_answer, reqs)
+
+
+def _client():
+    from fastapi.testclient import TestClient
+
+    return TestClient(main.app)
+
+
+def case_route_keywords(rows, args) -> Samples:
+    client = _client()
+    body = json.dumps({"texts": rows, "top": 40}, ensure_ascii=False).encode("utf-8")
+    headers = {"content-type": "application/json"}
+    lat = []
+    for _ in range(args.repeats):
+        main.extraction_cache.clear()
+        lat.append(_timed(lambda: client.post("/keywords", content=body, headers=headers).raise_for_status()))
+    return lat, len(rows)
+
+
+def case_route_assistant(rows, args) -> Samples:
+    client = _client()
+    ctx = jsonable_encoder(assistant_context(rows))
+    rng = random.Random(args.seed)
+    headers = {"content-type": "application/json"}
+    bodies = [
+        json.dumps({"question": rng.choice(QUESTIONS), "context": ctx}, ensure_ascii=False).encode("utf-8")
+        for _ in range(args.calls)
+    ]
+    # o fallback local registra um aviso por chamada; não polui o relatório
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _per_item(lambda b: client.post("/assistant", content=b, headers=headers).raise_for_status(), bodies)
+
+
+CASES: Dict[str, Tuple[Callable[..., Samples], str]] = {
+    "normalize": (case_normalize, "texts/s"),
+    "extract_from_text.cold": (case_extract_cold, "texts/s"),
+    "aggregate_keywords.cold": (case_aggregate_cold, "texts/s"),
+    "aggregate_keywords.warm": (case_aggregate_warm, "texts/s"),
+    "parse_json_tolerant": (case_parse_json, "calls/s"),
+    "build_answer": (case_build_answer, "calls/s"),
+    "route./keywords": (case_route_keywords, "texts/s"),
+    "route./assistant": (case_route_assistant, "calls/s"),
+}
+
+
+def _rss_mb() -> Dict[str, Optional[float]]:
+    """RSS atual e pico (VmHWM) do processo; fora do Linux usa só o ru_maxrss."""
+    current = peak = None
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+    return {"current": current, "peak": peak}
+
+
+def run_case(name: str, rows: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    fn, unit = CASES[name]
+    before = _rss_mb()
+    lat, units = fn(rows, args)
+    after = _rss_mb()
+    arr = np.asarray(lat, dtype=float)
+    return {
+        "case": name,
+        "size": len(rows),
+        "unit": unit,
+        "samples": int(arr.size),
+        "throughput": float(units * arr.size / arr.sum()) if arr.sum() > 0 else None,
+        "p50_ms": float(np.percentile(arr, 50) * 1000),
+        "p99_ms": float(np.percentile(arr, 99) * 1000),
+        "rss_start_mb": before["current"],
+        "peak_rss_mb": after["peak"],
+    }
+
+
+def _child(conn, name, rows, args) -> None:
+    try:
+        conn.send(run_case(name, rows, args))
+    except Exception as ex:  # o relatório segue com os demais casos
+        conn.send({"case": name, "size": len(rows), "error": repr(ex)})
+    finally:
+        conn.close()
+
+
+def run_isolated(name: str, rows: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    if args.no_fork or "fork" not in multiprocessing.get_all_start_methods():
+        return run_case(name, rows, args)
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(child, name, rows, args))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "lexicon_version": main.lexicons.current.version,
+        "repeats": args.repeats,
+        "calls": args.calls,
+    }
+
+
+def compare(current: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Compara com um JSON salvo; devolve as linhas que regrediram além da tolerância."""
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = {(r["case"], r["size"]): r for r in json.load(fh)["results"] if "error" not in r}
+    regressions = []
+    print(f"\nComparação com {baseline_path} (tolerância {tolerance:.0%}):")
+    for r in current:
+        base = baseline.get((r["case"], r["size"]))
+        if base is None or "error" in r or not base.get("throughput") or not r.get("throughput"):
+            continue
+        speed = r["throughput"] / base["throughput"]
+        p99 = r["p99_ms"] / base["p99_ms"] if base["p99_ms"] else 1.0
+        flag = ""
+        if speed < 1 - tolerance or p99 > 1 + tolerance:
+            flag = "  <-- regressão"
+            regressions.append(f"{r['case']}@{r['size']}")
+        print(f"  {r['case']:<26} {r['size']:>8}  vazão x{speed:5.2f}  p99 x{p99:5.2f}{flag}")
+    return regressions
+
+
+def print_header() -> None:
+    print(f"{'caso':<26} {'n':>8} {'vazão':>18} {'p50 ms':>10} {'p99 ms':>10} {'pico RSS MB':>12}")
+
+
+def print_row(r: Dict[str, Any]) -> None:
+    if "error" in r:
+        print(f"{r['case']:<26} {r['size']:>8}  ERRO: {r['error']}")
+        return
+    tput = f"{r['throughput']:,.0f} {r['unit']}" if r["throughput"] else "-"
+    peak = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "-"
+    print(f"{r['case']:<26} {r['size']:>8} {tput:>18} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {peak:>12}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks do serviço de IA do TalkClass")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="tamanhos de corpus (até 1000000)")
+    parser.add_argument("--cases", default=",".join(CASES), help="casos separados por vírgula")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--weeks", type=int, default=26)
+    parser.add_argument("--categories", type=int, default=12)
+    parser.add_argument("--repeats", type=int, default=5, help="repetições dos casos de lote inteiro")
+    parser.add_argument("--calls", type=int, default=2000, help="chamadas nos casos por requisição")
+    parser.add_argument("--out", help="arquivo JSON para salvar os resultados (baseline)")
+    parser.add_argument("--compare", help="JSON de baseline para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--no-fork", action="store_true", help="roda tudo no mesmo processo")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # o /assistant precisa ser determinístico e offline: força o fallback local
+    main.GEMINI_KEY = ""
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    names = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        print(f"Casos desconhecidos: {', '.join(unknown)}")
+        return 2
+
+    results: List[Dict[str, Any]] = []
+    print_header()
+    for size in sizes:
+        rows = synth.corpus(size, seed=args.seed, n_weeks=args.weeks, n_categories=args.categories)
+        for name in names:
+            results.append(run_isolated(name, rows, args))
+            print_row(results[-1])
+        del rows
+
+    report = {"meta": metadata(args), "results": results}
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"\nResultados salvos em {args.out}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\nRegressões: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
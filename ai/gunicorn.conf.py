@@ -0,0 +1,31 @@
+"""Configuração do gunicorn para rodar o serviço com vários workers uvicorn.
+
+O app é importado uma vez no processo mestre (preload) antes do fork: léxico compilado, autômato e o
+cache de extrações em mmap ficam compartilhados entre os workers (copy-on-write / memória compartilhada).
+Agregados do /keywords/ingest, fila do /enrich e sessões do assistente continuam por worker (ver README).
+Com WEB_CONCURRENCY=1 (padrão) o comportamento é o mesmo de `uvicorn main:app`.
+"""
+
+import gc
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+accesslog = "-"
+
+if workers > 1:
+    # um único cache de extrações para todos os workers em vez de um LRU por processo
+    os.environ.setdefault("EXTRACTION_SHARED_CACHE_MB", "64")
+    # POST /lexicon/reload chega a um só worker; os demais pegam a troca pelo arquivo
+    os.environ.setdefault("LEXICON_WATCH_SECONDS", "5")
+
+
+def when_ready(server):
+    # Congela os objetos do preload fora do GC: as coletas nos workers não tocam mais essas páginas,
+    # que continuam compartilhadas em vez de serem copiadas em cada processo.
+    gc.freeze()
+    server.log.info("Preload concluído; %s worker(s).", workers)
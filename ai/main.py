@@ -1,31 +1,136 @@
 from __future__ import annotations
 
-from collections import Counter, defaultdict
-from typing import Any, Dict, List, Optional, Tuple
+import time
 
-from fastapi import FastAPI
+# Marco zero do boot: o relatório de startup mede o import a partir daqui.
+_BOOT_T0 = time.perf_counter()
+
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Literal, Optional, Set, Tuple, Union
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import random
-import google.generativeai as genai
-from pydantic import BaseModel
-from rapidfuzz import process
-from unidecode import unidecode
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from pydantic import BaseModel, Field
 import numpy as np
-import yake
+
+from textprep import WORD_RE, NormalizedText, memo_stats, normalize, prepare
+import asyncio
+import bisect
+import hashlib
 import os
 import json
+import mmap
+import multiprocessing
 import re
-
-
-app = FastAPI(title="TalkClass AI", version="0.1.0")
-
-sentiment = SentimentIntensityAnalyzer()
-keyword_extractor = yake.KeywordExtractor(lan="pt", n=1, top=12, dedupLim=0.9, windowsSize=2)
+import secrets
+import sqlite3
+import struct
+import sys
+import threading
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup.phase("warm_start"):
+        if result_store is not None:
+            loaded = keyword_rollups.warm_start(result_store)
+            extracted, scored = warm_result_caches(result_store)
+            print(
+                f"[ai] Armazém local: {loaded} feedbacks recarregados nos agregados de keywords;"
+                f" {extracted} extrações e {scored} sentimentos nos caches."
+            )
+    with startup.phase("keyword_pool"):
+        start_keyword_pool()
+    enrichment.start()
+    # liveness já responde; readiness só depois do aquecimento (SDK do Gemini, autômato, NumPy)
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup))
+    watcher = asyncio.create_task(lexicons.watch(LEXICON_WATCH_SECONDS)) if LEXICON_WATCH_SECONDS > 0 else None
+    yield
+    warmup_task.cancel()
+    if watcher is not None:
+        watcher.cancel()
+    for task in list(late_answers):
+        task.cancel()
+    await enrichment.stop()
+    shutdown_keyword_pool()
+    if result_store is not None:
+        await asyncio.to_thread(result_store.flush)
+
+
+app = FastAPI(title="TalkClass AI", version="0.1.0", lifespan=lifespan)
 
 GEMINI_KEY = os.environ.get("GEMINI_API_KEY", "").strip()
+GEMINI_CHAT_MODEL = "gemini-2.5-flash"
+GEMINI_BATCH_MODEL = "gemini-2.5-flash-lite"
+# Limite global de chamadas simultâneas ao Gemini e prazo (s) de cada chamada antes do fallback local.
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "20"))
+# Disjuntor do Gemini: abre quando a taxa de falhas (erros, timeouts e chamadas acima de SLOW_SECONDS) nas
+# últimas WINDOW chamadas passa de ERROR_RATE (com pelo menos MIN_CALLS); aberto, as chamadas nem saem e o
+# fallback local responde. A sonda sai após OPEN_SECONDS (±20%), que dobra a cada sonda falha até MAX_OPEN_SECONDS.
+GEMINI_BREAKER_WINDOW = int(os.environ.get("GEMINI_BREAKER_WINDOW", "20"))
+GEMINI_BREAKER_MIN_CALLS = int(os.environ.get("GEMINI_BREAKER_MIN_CALLS", "5"))
+GEMINI_BREAKER_ERROR_RATE = float(os.environ.get("GEMINI_BREAKER_ERROR_RATE", "0.5"))
+GEMINI_BREAKER_SLOW_SECONDS = float(os.environ.get("GEMINI_BREAKER_SLOW_SECONDS", "10"))
+GEMINI_BREAKER_OPEN_SECONDS = float(os.environ.get("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+GEMINI_BREAKER_MAX_OPEN_SECONDS = float(os.environ.get("GEMINI_BREAKER_MAX_OPEN_SECONDS", "300"))
 # Permite desligar o uso do Gemini no cálculo de keywords/heatmap para evitar atrasos/timeouts.
 USE_GEMINI_KEYWORDS = os.environ.get("USE_GEMINI_KEYWORDS", "false").lower() == "true"
+# Quantidade máxima de textos com extração de keywords memorizada (0 desliga o cache).
+KEYWORD_CACHE_SIZE = int(os.environ.get("KEYWORD_CACHE_SIZE", "50000"))
+# Cache do /sentiment por texto normalizado (0 desliga)
+SENTIMENT_CACHE_SIZE = int(os.environ.get("SENTIMENT_CACHE_SIZE", "50000"))
+# Correção de erros de digitação antes do match de keywords: similaridade mínima (0-100, 0 desliga),
+# tamanho mínimo do token e nº de tokens memorizados (token -> termo do léxico).
+FUZZY_MATCH_THRESHOLD = float(os.environ.get("FUZZY_MATCH_THRESHOLD", "0"))
+FUZZY_MIN_TOKEN_LEN = int(os.environ.get("FUZZY_MIN_TOKEN_LEN", "5"))
+FUZZY_MEMO_SIZE = int(os.environ.get("FUZZY_MEMO_SIZE", "200000"))
+# Com valor > 0, o cache de extrações vira uma região mmap compartilhada (MB) entre os workers do gunicorn
+# (criada antes do fork com preload); 0 mantém o LRU por processo.
+EXTRACTION_SHARED_CACHE_MB = int(os.environ.get("EXTRACTION_SHARED_CACHE_MB", "0"))
+# Cache de respostas do /assistant: nº máximo de entradas e validade em segundos.
+ASSISTANT_CACHE_SIZE = int(os.environ.get("ASSISTANT_CACHE_SIZE", "256"))
+ASSISTANT_CACHE_TTL_SECONDS = float(os.environ.get("ASSISTANT_CACHE_TTL_SECONDS", "600"))
+# Sessões de contexto do assistente (POST /assistant/context): nº máximo de sessões e validade em segundos.
+ASSISTANT_SESSION_SIZE = int(os.environ.get("ASSISTANT_SESSION_SIZE", "128"))
+ASSISTANT_SESSION_TTL_SECONDS = float(os.environ.get("ASSISTANT_SESSION_TTL_SECONDS", "900"))
+# SLO de latência do /assistant (s): com valor > 0, fallback local e Gemini correm juntos e, estourado o prazo,
+# a resposta local já calculada é devolvida (o Gemini termina em segundo plano e alimenta o cache). 0 = sequencial.
+ASSISTANT_SLO_SECONDS = float(os.environ.get("ASSISTANT_SLO_SECONDS", "0"))
+# Orçamento (tokens estimados) para os dados de contexto enviados ao Gemini no chat; as instruções fixas vão à parte.
+ASSISTANT_PROMPT_TOKEN_BUDGET = int(os.environ.get("ASSISTANT_PROMPT_TOKEN_BUDGET", "1200"))
+# Fila de enriquecimento (Gemini por feedback): orçamento de tokens/itens por lote, janela de coleta (s),
+# lotes simultâneos, chamadas por minuto e quantidade de resultados mantidos em memória.
+ENRICH_BATCH_TOKEN_BUDGET = int(os.environ.get("ENRICH_BATCH_TOKEN_BUDGET", "4000"))
+ENRICH_BATCH_MAX_ITEMS = int(os.environ.get("ENRICH_BATCH_MAX_ITEMS", "50"))
+ENRICH_FLUSH_SECONDS = float(os.environ.get("ENRICH_FLUSH_SECONDS", "2"))
+ENRICH_MAX_CONCURRENT_BATCHES = int(os.environ.get("ENRICH_MAX_CONCURRENT_BATCHES", "2"))
+ENRICH_CALLS_PER_MINUTE = float(os.environ.get("ENRICH_CALLS_PER_MINUTE", "30"))
+ENRICH_RESULTS_SIZE = int(os.environ.get("ENRICH_RESULTS_SIZE", "100000"))
+# Banco SQLite local com resultados por feedback (vazio desliga); caminho relativo à pasta do serviço.
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", "data/ai-results.sqlite3").strip()
+# Extração paralela no /keywords: nº de processos (0 = serial) e tamanho mínimo do lote para paralelizar.
+KEYWORD_WORKERS = int(os.environ.get("KEYWORD_WORKERS", "0"))
+KEYWORD_PARALLEL_MIN_BATCH = int(os.environ.get("KEYWORD_PARALLEL_MIN_BATCH", "5000"))
+# Profiling sob demanda: token exigido no header X-Profile-Token (vazio desliga), intervalo de amostragem
+# (ms) e pasta (relativa à pasta do serviço) onde ficam as pilhas no formato "folded" do flamegraph.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "").strip()
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "data/profiles").strip()
+# Léxico (termos do heatmap, stopwords, sentimento) em JSON, relativo à pasta do serviço. Troca a quente via
+# POST /lexicon/reload (header X-Admin-Token = ADMIN_TOKEN; vazio desliga) ou vigiando o arquivo a cada N s (0 desliga).
+LEXICON_PATH = os.environ.get("LEXICON_PATH", "lexicon.json").strip()
+LEXICON_WATCH_SECONDS = float(os.environ.get("LEXICON_WATCH_SECONDS", "0"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "").strip()
+# Orçamento (ms) para importar o módulo; acima disso o relatório de startup emite um aviso.
+STARTUP_IMPORT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "1500"))
 ALLOWED_ORIGINS = [
     o.strip().rstrip("/")
     for o in os.environ.get("ALLOWED_ORIGINS", "").split(",")
@@ -44,170 +149,331 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-if GEMINI_KEY:
-    genai.configure(api_key=GEMINI_KEY)
-
-
-STOPWORDS = {
-    "a",
-    "o",
-    "os",
-    "as",
-    "de",
-    "da",
-    "do",
-    "das",
-    "dos",
-    "e",
-    "é",
-    "em",
-    "no",
-    "na",
-    "nos",
-    "nas",
-    "um",
-    "uma",
-    "uns",
-    "umas",
-    "para",
-    "por",
-    "com",
-    "sem",
-    "ao",
-    "à",
-    "aos",
-    "às",
-    "que",
-    "se",
-    "ser",
-    "tem",
-    "têm",
-    "ter",
-    "foi",
-    "era",
-    "são",
-    "está",
-    "estão",
-    "como",
-    "mais",
-    "menos",
-    "muito",
-    "muita",
-    "muitos",
-    "muitas",
-    "pouco",
-    "pouca",
-    "poucos",
-    "poucas",
-    "já",
-    "também",
-    "entre",
-    "até",
-    "quando",
-    "onde",
-    "porque",
-    "pois",
-    "per",
-    "sobre",
-    "sob",
-    "lhe",
-    "lhes",
-    "me",
-    "te",
-    "vai",
-    "depois",
-    "antes",
-    "agora",
-    "hoje",
-    "ontem",
-    "amanhã",
-    "pra",
-    "pro",
-    "q",
-    "pq",
-    "vc",
-    "vcs",
-    "ok",
-    "bom",
-    "boa",
-    "ruim",
-}
 
-# Palavras que forçam classificação negativa se aparecerem no texto.
-NEG_HINTS = {
-    "ruim",
-    "pior",
-    "horrivel",
-    "horrível",
-    "péssimo",
-    "pessimo",
-    "barulho",
-    "barulhento",
-    "quebrado",
-    "demora",
-    "lento",
-    "atraso",
-    "sujo",
-    "lotado",
-    "problema",
-    "falha",
-    "defeito",
-    "insatisfeito",
-}
+# ---------- STARTUP ----------
+class StartupReport:
+    """Tempo de cada fase do boot e estado de prontidão (readiness) exposto no /health."""
 
-# Palavras que devem sempre ir para o bucket negativo mesmo em textos neutros/positivos.
-KW_FORCE_NEG = {
-    "barulho",
-    "barulhento",
-    "barulhenta",
-    "barulhentas",
-    "barulhentos",
-    "ruido",
-    "ruídos",
-    "ruidos",
-    "ruidoso",
-    "ruidosa",
-    "pior",
-    "piorar",
-    "horrivel",
-    "horrível",
-    "pessimo",
-    "péssimo",
-    "quebrado",
-    "quebrados",
-    "lento",
-    "demora",
-    "atraso",
-    "lotado",
-    "sujo",
-    "falha",
-    "falhas",
-    "defeito",
-    "defeituoso",
-    "precisa",
-    "precisar",
-    "melhorar",
-    "melhoria",
-    "sinalizacao",
-    "sinalização",
-    "padronizar",
-    "padronizacao",
-}
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self._last = t0
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.ready_at: Optional[float] = None
+        self.errors: List[str] = []
 
-# Palavras a serem ignoradas no bucket positivo (caso apareçam só entram no negativo ou são descartadas).
-KW_EXCLUDE_POS = {
-    "precisa",
-    "melhorar",
-    "sinalizacao",
-    "sinalização",
-    "padronizar",
-    "padronizacao",
-    "barulho",
-    "barulhento",
-    "barulhentas",
-    "barulhenta",
-    "ruido",
-}
+    def mark(self, name: str) -> None:
+        """Fecha uma fase do import: tempo desde a marca anterior."""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._last
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def import_ms(self) -> float:
+        """Duração do import do módulo (até a última marca feita no nível do módulo)."""
+        return (self._last - self.t0) * 1000
+
+    def set_ready(self) -> None:
+        self.ready = True
+        self.ready_at = time.perf_counter()
+        report = ", ".join(f"{name} {sec * 1000:.0f} ms" for name, sec in self.phases.items())
+        print(f"[ai] Startup: {report}; pronto em {(self.ready_at - self.t0) * 1000:.0f} ms.")
+        if self.import_ms() > STARTUP_IMPORT_BUDGET_MS:
+            print(f"[ai] Import acima do orçamento ({self.import_ms():.0f} ms > {STARTUP_IMPORT_BUDGET_MS:.0f} ms).")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "phasesMs": {name: round(sec * 1000, 1) for name, sec in self.phases.items()},
+            "readyMs": round((self.ready_at - self.t0) * 1000, 1) if self.ready_at else None,
+            "errors": self.errors,
+        }
+
+
+startup = StartupReport(_BOOT_T0)
+startup.mark("imports")
+
+
+# ---------- MÉTRICAS ----------
+class MetricCounter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, value: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in self._values.items():
+                lines.append(f"{self.name}{format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class MetricHistogram:
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # por combinação de labels: [contagem por bucket..., +Inf], soma
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total) in self._series.items():
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{self.name}_bucket{format_labels((*self.labels, 'le'), (*values, le))} {cumulative}"
+                    )
+                lines.append(f"{self.name}_sum{format_labels(self.labels, values)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """Registro mínimo no formato texto do Prometheus (sem dependências externas)."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Any] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> MetricCounter:
+        metric = MetricCounter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), **kwargs) -> MetricHistogram:
+        metric = MetricHistogram(name, help_text, labels, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Registra função que gera linhas na hora da coleta (ex.: estatísticas de caches)."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram(
+    "talkclass_ai_request_duration_seconds", "Latência das requisições HTTP por rota.", ("method", "route", "status")
+)
+KEYWORD_TEXTS = metrics.histogram(
+    "talkclass_ai_keywords_texts",
+    "Textos processados por chamada de keywords.",
+    ("route",),
+    buckets=(10, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000),
+)
+KEYWORD_STAGE_SECONDS = metrics.histogram(
+    "talkclass_ai_keywords_stage_seconds",
+    "Tempo por etapa do /keywords (normalize, match, aggregate, sort, serialize).",
+    ("route", "stage"),
+)
+GEMINI_SECONDS = metrics.histogram("talkclass_ai_gemini_duration_seconds", "Latência das chamadas ao Gemini.", ("model",))
+GEMINI_CALLS = metrics.counter(
+    "talkclass_ai_gemini_calls_total",
+    "Chamadas ao Gemini por resultado (ok, invalid_json, exception, no_candidates, timeout, circuit_open).",
+    ("call", "outcome"),
+)
+GEMINI_TOKENS = metrics.counter(
+    "talkclass_ai_gemini_tokens_total",
+    "Tokens das chamadas ao Gemini (prompt, cached = parte do prompt servida pelo cache de contexto, output).",
+    ("model", "kind"),
+)
+ASSISTANT_ANSWERS = metrics.counter(
+    "talkclass_ai_assistant_answers_total",
+    "Respostas do /assistant por origem (llm, local_fallback, local_slo) e conclusões tardias do Gemini (late_ok, late_fail).",
+    ("outcome",),
+)
+
+
+def observe_keyword_stages(route: str, texts: int, timings: Dict[str, float]) -> None:
+    KEYWORD_TEXTS.observe(texts, route)
+    for stage, seconds in timings.items():
+        KEYWORD_STAGE_SECONDS.observe(seconds, route, stage)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: mede a latência por rota (template do path) e status, sem envolver o corpo."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # paths sem rota viram um único label para não explodir a cardinalidade
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], path, str(status[0]))
+
+
+app.add_middleware(MetricsMiddleware)
+
+
+# ---------- PROFILER ----------
+def profile_dir() -> str:
+    if os.path.isabs(PROFILE_DIR):
+        return PROFILE_DIR
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), PROFILE_DIR)
+
+
+def token_matches(value: Optional[str], token: str) -> bool:
+    """Compara um header com o token em tempo constante, em bytes (header não-ASCII não pode virar 500)."""
+    if not token or value is None:
+        return False
+    # o Starlette decodifica headers como latin-1: voltar para os bytes originais
+    return secrets.compare_digest(value.encode("latin-1", "replace"), token.encode("utf-8"))
+
+
+def has_profile_token(value: Optional[str]) -> bool:
+    return token_matches(value, PROFILE_TOKEN)
+
+
+class StackSampler:
+    """Amostra as pilhas de todas as threads (exceto a própria) e agrega no formato "folded" (flamegraph.pl/speedscope)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ai-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilerMiddleware:
+    """Perfila uma requisição quando o header X-Profile-Token confere; só é instalado se PROFILE_TOKEN existir."""
+
+    def __init__(self, app):
+        self.app = app
+        # uma requisição perfilada por vez: as amostras cobrem todas as threads do processo
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = dict(scope["headers"]).get(b"x-profile-token")
+        if scope["path"].startswith("/profiles/") or not has_profile_token(token.decode("latin-1") if token else None) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(4)}.folded"
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", name.encode())]
+            await send(message)
+
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            sampler.stop()
+            self._busy.release()
+            elapsed = time.perf_counter() - start
+            try:
+                os.makedirs(profile_dir(), exist_ok=True)
+                with open(os.path.join(profile_dir(), name), "w", encoding="utf-8") as fh:
+                    fh.write(sampler.folded())
+                print(f"[ai] Perfil de {scope['path']} salvo em {name} ({elapsed * 1000:.0f} ms, {sum(sampler.samples.values())} amostras).")
+            except OSError as ex:
+                print(f"[ai] Falha ao salvar perfil ({ex!r}).")
+
+
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilerMiddleware)
 
 
 # ---------- MODELOS ----------
@@ -218,10 +484,15 @@ class FeedbackText(BaseModel):
     categoryId: Optional[str] = None
 
 
+# "global": top N do período inteiro; "week": top N de cada semana
+KeywordRank = Literal["global", "week"]
+
+
 class KeywordRequest(BaseModel):
     texts: List[FeedbackText]
     top: int = 40
     min_freq: int = 1
+    rank: KeywordRank = "global"
 
 
 class HeatItem(BaseModel):
@@ -237,6 +508,38 @@ class KeywordResponse(BaseModel):
     neg: List[HeatItem]
 
 
+class KeywordMatrixResponse(BaseModel):
+    """Heatmap semanas × keywords (categorias somadas): total[i][j] e score médio[i][j] (None sem ocorrência)."""
+
+    weeks: List[str]
+    keywords: List[str]
+    total: List[List[int]]
+    score: List[List[Optional[float]]]
+
+
+class KeywordIngestRequest(BaseModel):
+    texts: List[FeedbackText]
+
+
+class KeywordIngestResponse(BaseModel):
+    ingested: int
+    updated: int
+    skipped: int
+    documents: int
+    buckets: int
+    # documentos extraídos com uma versão anterior do léxico (convergem quando o texto é reenviado)
+    stale: int = 0
+
+
+class KeywordQuery(BaseModel):
+    weekFrom: Optional[str] = None
+    weekTo: Optional[str] = None
+    categoryIds: Optional[List[str]] = None
+    top: int = 40
+    min_freq: int = 1
+    rank: KeywordRank = "global"
+
+
 class SeriesPoint(BaseModel):
     bucket: str
     avg: Optional[float] = None
@@ -270,7 +573,26 @@ class AssistantContext(BaseModel):
 
 class AssistantRequest(BaseModel):
     question: str
-    context: AssistantContext
+    context: AssistantContext = Field(default_factory=AssistantContext)
+    # sessão registrada em /assistant/context; quando presente, substitui o `context`
+    sessionId: Optional[str] = None
+
+
+class AssistantSessionRequest(BaseModel):
+    """Registra o contexto de um conjunto de filtros; `texts` (opcional) alimenta words_neg/words_pos."""
+
+    sessionId: Optional[str] = None
+    context: AssistantContext = Field(default_factory=AssistantContext)
+    texts: List[FeedbackText] = []
+    top: int = 32
+
+
+class AssistantSessionResponse(BaseModel):
+    sessionId: str
+    expiresIn: float
+    texts: int
+    wordsNeg: int
+    wordsPos: int
 
 
 class AssistantResponse(BaseModel):
@@ -280,6 +602,26 @@ class AssistantResponse(BaseModel):
     filters: Dict[str, str] = {}
 
 
+class SentimentText(BaseModel):
+    id: str
+    text: str
+
+
+class SentimentRequest(BaseModel):
+    texts: List[SentimentText]
+
+
+class SentimentItem(BaseModel):
+    id: str
+    sentiment: str
+    score: float
+    score01: float
+
+
+class SentimentResponse(BaseModel):
+    items: List[SentimentItem]
+
+
 class FeedbackAiResult(BaseModel):
     id: str
     sentiment: str
@@ -288,9 +630,37 @@ class FeedbackAiResult(BaseModel):
     summary: Optional[str] = None
 
 
+class EnrichRequest(BaseModel):
+    texts: List[SentimentText]
+
+
+class EnrichResponse(BaseModel):
+    queued: int
+    pending: int
+
+
+class EnrichLookupRequest(BaseModel):
+    ids: List[str]
+
+
+class EnrichLookupResponse(BaseModel):
+    results: List[FeedbackAiResult]
+    pending: List[str] = []
+    missing: List[str] = []
+
+
 # ---------- HELPERS ----------
-def normalize(text: str) -> str:
-    return unidecode((text or "").lower().strip())
+_keyword_extractor: Any = None
+
+
+def get_keyword_extractor() -> Any:
+    """YAKE só é carregado se o fallback for usado."""
+    global _keyword_extractor
+    if _keyword_extractor is None:
+        import yake
+
+        _keyword_extractor = yake.KeywordExtractor(lan="pt", n=1, top=12, dedupLim=0.9, windowsSize=2)
+    return _keyword_extractor
 
 
 def split_keywords(text: str) -> List[str]:
@@ -299,27 +669,157 @@ def split_keywords(text: str) -> List[str]:
         return []
     kws = []
     try:
-        kws = [normalize(k) for k, _ in keyword_extractor.extract_keywords(text)]
+        kws = [normalize(k) for k, _ in get_keyword_extractor().extract_keywords(text)]
     except Exception:
         kws = []
     out = []
     for kw in kws:
         if len(kw) < 3:
             continue
-        if kw in STOPWORDS:
+        if kw in lexicons.current.stopwords:
             continue
         out.append(kw)
     return out
 
 
+# Tokens do sentimento: palavras e a pontuação que encerra o alcance de uma negação.
+SENTIMENT_TOKEN_RE = re.compile(r"[a-z]+|[.,;:!?]")
+
+
+class SentimentEngine:
+    """Sentimento em lote: o lote vira uma matriz esparsa CSR (docs x vocabulário) pontuada só com NumPy."""
+
+    # Mesmo fator de inversão usado pelo VADER para palavras negadas.
+    NEGATION_SCALAR = -0.74
+
+    def __init__(
+        self,
+        unigrams: Dict[str, float],
+        bigrams: Dict[Tuple[str, str], float],
+        negators: Set[str],
+        intensifiers: Dict[str, float],
+        negation_window: int = 3,
+        alpha: float = 1.0,
+    ):
+        self.unigrams = unigrams
+        self.bigrams = bigrams
+        self.negators = negators
+        self.intensifiers = intensifiers
+        self.negation_window = negation_window
+        self.alpha = alpha
+
+    @classmethod
+    def from_lexicons(
+        cls,
+        general: Dict[str, float],
+        term_dicts: Iterable[Dict[str, float]],
+        neg_hints: Iterable[str],
+        negators: Iterable[str],
+        intensifiers: Dict[str, float],
+    ) -> "SentimentEngine":
+        """Combina o léxico geral com os dicionários do heatmap (termos de 1 ou 2 palavras) e as dicas negativas."""
+        unigrams: Dict[str, float] = dict(general)
+        bigrams: Dict[Tuple[str, str], float] = {}
+        for terms in term_dicts:
+            for term, score in terms.items():
+                toks = SENTIMENT_TOKEN_RE.findall(normalize(term))
+                if len(toks) == 1:
+                    unigrams[toks[0]] = score
+                elif len(toks) == 2:
+                    bigrams[(toks[0], toks[1])] = score
+        for hint in neg_hints:
+            unigrams.setdefault(normalize(hint), -0.6)
+        return cls(unigrams, bigrams, set(negators), dict(intensifiers))
+
+    @staticmethod
+    def tokenize_batch(texts: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Retorna (indptr, indices, vocab): a matriz CSR do lote com os tokens na ordem em que aparecem."""
+        vocab: Dict[str, int] = {}
+        indices: List[int] = []
+        indptr = [0]
+        assign = vocab.setdefault
+        for text in texts:
+            for tok in SENTIMENT_TOKEN_RE.findall(normalize(text)):
+                indices.append(assign(tok, len(vocab)))
+            indptr.append(len(indices))
+        return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64), list(vocab)
+
+    def score_batch(self, texts: List[str]) -> np.ndarray:
+        """Compound em [-1, 1] por texto (mesma escala do antigo VADER)."""
+        indptr, indices, vocab = self.tokenize_batch(texts)
+        n_docs = len(indptr) - 1
+        if not len(indices):
+            return np.zeros(n_docs, dtype=float)
+
+        # Propriedades por termo do vocabulário do lote (um lookup por palavra distinta, não por ocorrência)
+        lex = np.array([self.unigrams.get(w, 0.0) for w in vocab], dtype=float)
+        is_negator = np.array([w in self.negators for w in vocab], dtype=bool)
+        is_break = np.array([not w.isalpha() for w in vocab], dtype=bool)
+        boost = np.array([self.intensifiers.get(w, 1.0) for w in vocab], dtype=float)
+
+        doc_of = np.repeat(np.arange(n_docs), np.diff(indptr))
+        doc_start = indptr[:-1][doc_of]
+        pos = np.arange(len(indices))
+        same_doc = doc_of[:-1] == doc_of[1:]
+        values = lex[indices]
+
+        # Bigramas do léxico ("bom atendimento"): o score do par substitui o das palavras isoladas
+        ids = {w: i for i, w in enumerate(vocab)}
+        width = len(vocab)
+        pairs = sorted(
+            (ids[a] * width + ids[b], sc) for (a, b), sc in self.bigrams.items() if a in ids and b in ids
+        )
+        if pairs and len(indices) > 1:
+            keys = np.array([k for k, _ in pairs], dtype=np.int64)
+            scores = np.array([sc for _, sc in pairs], dtype=float)
+            observed = indices[:-1] * width + indices[1:]
+            loc = np.searchsorted(keys, observed).clip(max=len(keys) - 1)
+            hit = np.nonzero((keys[loc] == observed) & same_doc)[0]
+            values[hit] = 0.0
+            values[hit + 1] = scores[loc[hit]]
+
+        # Intensificadores multiplicam a palavra seguinte
+        values[1:] *= np.where(same_doc, boost[indices[:-1]], 1.0)
+
+        # Janela de negação: último negador antes do token, no mesmo documento e na mesma oração, a até N
+        # posições. Negador dentro da janela de outro é reforço ("sem problema nenhum"), não nova inversão.
+        def last_before(mask: np.ndarray) -> np.ndarray:
+            last = np.maximum.accumulate(np.where(mask, pos, -1))
+            return np.concatenate(([-1], last[:-1]))
+
+        last_break = np.maximum(last_before(is_break[indices]), doc_start - 1)
+
+        def in_window(neg_mask: np.ndarray) -> np.ndarray:
+            prev_neg = last_before(neg_mask)
+            return (prev_neg > last_break) & (pos - prev_neg <= self.negation_window)
+
+        negator_at = is_negator[indices]
+        negated = in_window(negator_at & ~in_window(negator_at))
+        values = np.where(negated, values * self.NEGATION_SCALAR, values)
+
+        sums = np.bincount(doc_of, weights=values, minlength=n_docs)
+        return sums / np.sqrt(sums * sums + self.alpha)
+
+
+def compute_sentiment_batch(texts: List[str]) -> np.ndarray:
+    return lexicons.current.sentiment.score_batch(texts)
+
+
 def compute_sentiment(text: str) -> float:
-    res = sentiment.polarity_scores(text or "")
-    return float(res.get("compound", 0.0))
+    return float(compute_sentiment_batch([text or ""])[0])
+
+
+def sentiment_label(score: float) -> str:
+    if score >= 0.05:
+        return "pos"
+    if score <= -0.05:
+        return "neg"
+    return "neu"
 
 
 def is_negative_hint(text: str) -> bool:
     t = normalize(text)
-    return any(h in t for h in NEG_HINTS)
+    return any(h in t for h in lexicons.current.neg_hints)
 
 
 def choose_variant(options: List[str], seed: str) -> str:
@@ -330,9 +830,9 @@ def choose_variant(options: List[str], seed: str) -> str:
     return options[idx]
 
 
-def detect_focus(question: str) -> Dict[str, bool]:
+def detect_focus(question: Union[str, NormalizedText]) -> Dict[str, bool]:
     """Identifica intenção principal para ajustar tom/ênfase da resposta local."""
-    q = normalize(question)
+    q = prepare(question).text
     def has_any(keywords: List[str]) -> bool:
         return any(k in q for k in keywords)
 
@@ -369,8 +869,8 @@ GREETINGS = {
 }
 
 
-def is_greeting(question: str) -> bool:
-    q = normalize(question)
+def is_greeting(question: Union[str, NormalizedText]) -> bool:
+    q = prepare(question).text
     if not q:
         return False
     stripped = q.replace("?", "").replace("!", "").strip()
@@ -380,10 +880,11 @@ def is_greeting(question: str) -> bool:
     return len(stripped.split()) <= 4 and any(g in stripped for g in GREETINGS)
 
 
-def infer_intent(question: str) -> str:
+def infer_intent(question: Union[str, NormalizedText]) -> str:
     """Retorna a intenção dominante para guiar prompt/resposta."""
-    q = normalize(question)
-    if is_greeting(q):
+    nq = prepare(question)
+    q = nq.text
+    if is_greeting(nq):
         return "saudacao"
     intents = [
         ("resumo", ["resumo", "geral", "panorama", "visao", "visão geral", "últimos", "ultimos", "30 dias"]),
@@ -398,10 +899,267 @@ def infer_intent(question: str) -> str:
     return "generic"
 
 
-def call_gemini_batch(texts: List[FeedbackText]) -> List[FeedbackAiResult]:
+_genai: Any = None
+_lazy_lock = threading.Lock()
+
+
+def load_genai() -> Any:
+    """Importa e configura o SDK do Gemini só no primeiro uso (o import leva quase 1 s)."""
+    global _genai
+    if _genai is None:
+        with _lazy_lock:
+            if _genai is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=GEMINI_KEY)
+                _genai = genai
+    return _genai
+
+
+class CircuitOpenError(Exception):
+    """Disjuntor aberto: a chamada ao Gemini nem é feita."""
+
+
+class CircuitBreaker:
+    """Disjuntor fechado / aberto / meio-aberto sobre uma janela das últimas chamadas.
+
+    Chamadas lentas contam como falha. Aberto, recusa tudo até o fim da espera (com jitter, para os workers
+    não sondarem juntos); então deixa passar uma única sonda: sucesso fecha, falha reabre com espera dobrada.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        error_rate: float,
+        slow_seconds: float,
+        open_seconds: float,
+        max_open_seconds: float,
+    ):
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self.state = "closed"
+        self.results: Deque[bool] = deque(maxlen=max(1, window))
+        self.cooldown = open_seconds
+        self.retry_at = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def acquire(self) -> bool:
+        """Libera a chamada (True se ela é a sonda do meio-aberto) ou lança CircuitOpenError."""
+        if self.state == "closed":
+            return False
+        if self.state == "open" and time.monotonic() >= self.retry_at:
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        raise CircuitOpenError(f"circuito do Gemini {self.state}")
+
+    def record(self, ok: bool, seconds: float, probe: bool) -> None:
+        ok = ok and (self.slow_seconds <= 0 or seconds < self.slow_seconds)
+        if probe:
+            if ok:
+                self.state = "closed"
+                self.results.clear()
+                self.cooldown = self.open_seconds
+                self.probing = False
+                print("[ai] Gemini respondeu à sonda; circuito fechado.")
+            else:
+                self.cooldown = min(self.cooldown * 2, self.max_open_seconds)
+                self._open()
+            return
+        if self.state != "closed":
+            # chamada iniciada antes de abrir: não decide nada
+            return
+        self.results.append(ok)
+        failures = self.results.count(False)
+        if len(self.results) >= self.min_calls and failures / len(self.results) >= self.error_rate:
+            self._open()
+
+    def release(self, probe: bool) -> None:
+        """Chamada abandonada por quem a fez (ex.: cliente SSE desconectou): não conta; a sonda libera a vaga."""
+        if probe and self.state == "half_open":
+            self.probing = False
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.probing = False
+        self.trips += 1
+        wait = self.cooldown * random.uniform(0.8, 1.2)
+        self.retry_at = time.monotonic() + wait
+        print(f"[ai] Circuito do Gemini aberto; nova sonda em {wait:.1f}s.")
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = len(self.results)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "errorRate": round(self.results.count(False) / calls, 4) if calls else 0.0,
+            "trips": self.trips,
+            "retryIn": round(max(0.0, self.retry_at - time.monotonic()), 1) if self.state == "open" else 0.0,
+        }
+
+
+class GeminiClient:
+    """Camada async do Gemini: modelos compartilhados, limite global de chamadas em voo, prazo e disjuntor."""
+
+    def __init__(self, max_concurrency: int, timeout: float, breaker: CircuitBreaker):
+        self.timeout = timeout
+        self.breaker = breaker
+        self._models: Dict[str, Any] = {}
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    def model(self, name: str, system_instruction: Optional[str] = None) -> Any:
+        """Reusa uma instância de GenerativeModel por nome + instruções de sistema (e o canal gRPC por trás dela)."""
+        key = (name, system_instruction)
+        model = self._models.get(key)
+        if model is None:
+            model = self._models[key] = load_genai().GenerativeModel(name, system_instruction=system_instruction)
+        return model
+
+    @staticmethod
+    def observe_usage(model_name: str, resp: Any) -> None:
+        """Contabiliza tokens de entrada, de entrada vindos do cache do Gemini e de saída (usage_metadata)."""
+        usage = getattr(resp, "usage_metadata", None)
+        if usage is None:
+            return
+        for kind, attr in (
+            ("prompt", "prompt_token_count"),
+            ("cached", "cached_content_token_count"),
+            ("output", "candidates_token_count"),
+        ):
+            value = getattr(usage, attr, 0) or 0
+            if value:
+                GEMINI_TOKENS.inc(model_name, kind, value=value)
+
+    async def generate(
+        self,
+        model_name: str,
+        contents: List[Dict[str, Any]],
+        generation_config: Dict[str, Any],
+        timeout: Optional[float] = None,
+        system_instruction: Optional[str] = None,
+    ) -> Any:
+        """Chama generate_content_async; o prazo inclui a espera pelo semáforo.
+
+        Lança asyncio.TimeoutError, ou CircuitOpenError sem chamar nada quando o disjuntor está aberto.
+        """
+        probe = self.breaker.acquire()
+        began = time.perf_counter()
+
+        async def run() -> Any:
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    return await self.model(model_name, system_instruction).generate_content_async(
+                        contents, generation_config=generation_config
+                    )
+                finally:
+                    GEMINI_SECONDS.observe(time.perf_counter() - start, model_name)
+
+        try:
+            result = await asyncio.wait_for(run(), timeout=self.timeout if timeout is None else timeout)
+        except asyncio.CancelledError:
+            # cancelado por quem chamou, não pelo prazo (que vira TimeoutError): neutro para o disjuntor
+            self.breaker.release(probe)
+            raise
+        except BaseException:
+            self.breaker.record(False, time.perf_counter() - began, probe)
+            raise
+        self.breaker.record(True, time.perf_counter() - began, probe)
+        self.observe_usage(model_name, result)
+        return result
+
+    async def stream(
+        self,
+        model_name: str,
+        contents: List[Dict[str, Any]],
+        generation_config: Dict[str, Any],
+        timeout: Optional[float] = None,
+        system_instruction: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """generate_content_async com stream=True: devolve os trechos de texto conforme chegam.
+
+        O prazo vale para o stream inteiro (semáforo incluído). Lança asyncio.TimeoutError ou CircuitOpenError.
+        """
+        probe = self.breaker.acquire()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+
+        def remaining() -> float:
+            return max(0.0, deadline - loop.time())
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=remaining())
+        except asyncio.CancelledError:
+            self.breaker.release(probe)
+            raise
+        except BaseException:
+            self.breaker.record(False, 0.0, probe)
+            raise
+        start = time.perf_counter()
+        # None = quem consome fechou/cancelou o stream antes do fim: não diz nada sobre o Gemini
+        ok: Optional[bool] = False
+        received = False
+        try:
+            resp = await asyncio.wait_for(
+                self.model(model_name, system_instruction).generate_content_async(
+                    contents, generation_config=generation_config, stream=True
+                ),
+                timeout=remaining(),
+            )
+            chunks = resp.__aiter__()
+            chunk = None
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                except StopAsyncIteration:
+                    break
+                for cand in chunk.candidates or []:
+                    for part in cand.content.parts:
+                        text = getattr(part, "text", "") or ""
+                        if text:
+                            received = True
+                            yield text
+            ok = True
+            # o uso de tokens vem completo no último trecho
+            if chunk is not None:
+                self.observe_usage(model_name, chunk)
+        except (GeneratorExit, asyncio.CancelledError):
+            # se já chegou texto o Gemini estava respondendo: conta como sucesso
+            ok = True if received else None
+            raise
+        finally:
+            self._semaphore.release()
+            GEMINI_SECONDS.observe(time.perf_counter() - start, model_name)
+            if ok is None:
+                self.breaker.release(probe)
+            else:
+                self.breaker.record(ok, time.perf_counter() - start, probe)
+
+
+gemini = GeminiClient(
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_TIMEOUT_SECONDS,
+    CircuitBreaker(
+        GEMINI_BREAKER_WINDOW,
+        GEMINI_BREAKER_MIN_CALLS,
+        GEMINI_BREAKER_ERROR_RATE,
+        GEMINI_BREAKER_SLOW_SECONDS,
+        GEMINI_BREAKER_OPEN_SECONDS,
+        GEMINI_BREAKER_MAX_OPEN_SECONDS,
+    ),
+)
+
+
+async def call_gemini_batch(texts: List[SentimentText]) -> List[FeedbackAiResult]:
     if not GEMINI_KEY or not texts:
         return []
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
     # monta payload pequeno para instruir saída JSON
     rows = [{"id": t.id, "text": t.text} for t in texts]
     prompt = (
@@ -412,7 +1170,8 @@ def call_gemini_batch(texts: List[FeedbackText]) -> List[FeedbackAiResult]:
         "score01 indica positividade (0=negativo, 0.5=neutro, 1=positivo)."
     )
     try:
-        resp = model.generate_content(
+        resp = await gemini.generate(
+            GEMINI_BATCH_MODEL,
             [
                 # Gemini requer apenas roles 'user' ou 'model'. Passamos tudo como 'user'.
                 {"role": "user", "parts": [{"text": "Saída apenas JSON válido."}]},
@@ -420,8 +1179,16 @@ def call_gemini_batch(texts: List[FeedbackText]) -> List[FeedbackAiResult]:
             ],
             generation_config={"temperature": 0.2, "top_p": 0.9},
         )
-        text = resp.candidates[0].content.parts[0].text if resp.candidates else ""
-        data = json.loads(text)
+        if not resp.candidates:
+            GEMINI_CALLS.inc("batch", "no_candidates")
+            return []
+        text = resp.candidates[0].content.parts[0].text
+        try:
+            data = json.loads(text)
+        except ValueError:
+            GEMINI_CALLS.inc("batch", "invalid_json")
+            return []
+        stopwords = lexicons.current.stopwords
         out: List[FeedbackAiResult] = []
         for item in data:
             out.append(
@@ -429,198 +1196,1197 @@ def call_gemini_batch(texts: List[FeedbackText]) -> List[FeedbackAiResult]:
                     id=str(item.get("id", "")),
                     sentiment=str(item.get("sentiment", "neu")).lower(),
                     score01=float(item.get("score01", 0.5)),
-                    keywords=[normalize(k) for k in item.get("keywords", []) if normalize(k) and normalize(k) not in STOPWORDS][:4],
+                    keywords=[nk for nk in map(normalize, item.get("keywords", [])) if nk and nk not in stopwords][:4],
                     summary=item.get("summary"),
                 )
             )
+        GEMINI_CALLS.inc("batch", "ok")
         return out
+    except CircuitOpenError:
+        GEMINI_CALLS.inc("batch", "circuit_open")
+        return []
+    except asyncio.TimeoutError:
+        GEMINI_CALLS.inc("batch", "timeout")
+        return []
     except Exception:
+        GEMINI_CALLS.inc("batch", "exception")
         return []
 
 
-def aggregate_keywords(payload: KeywordRequest) -> KeywordResponse:
-    """Extrai keywords positivas/negativas com regras de sentimento e filtragem de termos neutros."""
+class LexiconMatcher:
+    """Autômato Aho-Corasick: encontra todos os padrões (inclusive sobrepostos) numa única varredura."""
+
+    def __init__(self, patterns: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        own: List[Tuple[str, ...]] = [()]
+        for pattern in dict.fromkeys(p for p in patterns if p):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    own.append(())
+                state = nxt
+            own[state] = own[state] + (pattern,)
+
+        # BFS calcula os links de falha e já resolve as transições (DFA completo sobre o alfabeto do léxico).
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        out: List[Tuple[str, ...]] = list(own)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            out[state] = own[state] + out[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                queue.append(nxt)
+        self._delta = delta
+        self._out = out
+
+    def find(self, text: str) -> Set[str]:
+        """Retorna o conjunto de padrões contidos em `text` (mesma semântica de `padrao in text`)."""
+        delta = self._delta
+        out = self._out
+        hits: Set[str] = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+
+class KeywordLexicon:
+    """Regras de keywords compiladas uma vez sobre um único autômato (positivos, negações e negativos)."""
+
+    def __init__(
+        self,
+        positive: Dict[str, float],
+        negative_strong: Dict[str, float],
+        negative: Dict[str, float],
+        neutral: Set[str],
+        force_negative: Set[str] = frozenset(),
+        exclude_positive: Set[str] = frozenset(),
+    ):
+        # Cada regra: (keyword, score, padrões que bloqueiam). A ordem da lista reproduz a ordem de
+        # avaliação original: negações de positivos, positivos, negativos fortes, negativos moderados.
+        rules: List[Tuple[str, float, Tuple[str, ...]]] = []
+        triggers: List[Tuple[str, ...]] = []
+
+        # Negação explícita: "falta de X"/"sem X" para termos positivos -> negativa
+        for pkw, pscore in positive.items():
+            rules.append((f"falta de {pkw}", min(-0.05, -abs(pscore) * 1.0), ()))
+            triggers.append((f"falta de {pkw}", f"sem {pkw}"))
+        for pkw, pscore in positive.items():
+            if pkw in exclude_positive:
+                continue
+            rules.append((pkw, max(0.05, pscore), (f"falta de {pkw}", f"sem {pkw}")))
+            triggers.append((pkw,))
+        for nkw, nscore in negative_strong.items():
+            rules.append((nkw, nscore, ()))
+            triggers.append((nkw,))
+        for nkw, nscore in negative.items():
+            rules.append((nkw, nscore, ()))
+            triggers.append((nkw,))
+
+        self._rules: List[Tuple[str, float, Tuple[str, ...]]] = []
+        self._by_pattern: Dict[str, List[int]] = defaultdict(list)
+        for rule, pats in zip(rules, triggers):
+            if rule[0] in neutral:
+                continue
+            if rule[0] in force_negative:
+                rule = (rule[0], min(-0.05, -abs(rule[1])), rule[2])
+            idx = len(self._rules)
+            self._rules.append(rule)
+            for pat in pats:
+                self._by_pattern[pat].append(idx)
+        self._by_pattern = dict(self._by_pattern)
+        self.matcher = LexiconMatcher(self._by_pattern)
+
+    def match(self, norm: str) -> List[Tuple[str, float]]:
+        """Lista (keyword, score) de todas as regras disparadas no texto já normalizado, na ordem original."""
+        hits = self.matcher.find(norm)
+        if not hits:
+            return []
+        fired = sorted({idx for pat in hits for idx in self._by_pattern[pat]})
+        found: List[Tuple[str, float]] = []
+        for idx in fired:
+            kw, sc, blocked = self._rules[idx]
+            if blocked and not hits.isdisjoint(blocked):
+                continue
+            found.append((kw, sc))
+        return found
+
+
+class FuzzyCorrector:
+    """Troca tokens com erro de digitação pelo termo mais parecido do léxico ("desorganisado" -> "desorganizado").
+
+    Cada token distinto é comparado uma única vez (rapidfuzz.cdist em lote) e o resultado fica memorizado;
+    o texto corrigido segue para o mesmo autômato de match exato.
+    """
+
+    def __init__(self, vocab: Iterable[str], threshold: float, min_len: int, memo_size: int):
+        self.vocab = sorted({tok for tok in vocab if len(tok) >= min_len})
+        self.threshold = threshold
+        self.min_len = min_len
+        self.memo_size = max(1, memo_size)
+        # token -> termo corrigido (None = sem correção); termos do léxico já começam conhecidos
+        self._memo: Dict[str, Optional[str]] = {tok: None for tok in self.vocab}
+        self._lock = threading.Lock()
+
+    def _candidates(self, tokens: Iterable[str]) -> List[str]:
+        memo = self._memo
+        return [tok for tok in set(tokens) if len(tok) >= self.min_len and tok not in memo]
+
+    def learn(self, norms: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Resolve de uma vez todos os tokens ainda desconhecidos do lote; devolve o memo já com eles."""
+        tokens = self._candidates(tok for norm in norms for tok in WORD_RE.findall(norm))
+        if not tokens or not self.vocab:
+            return self._memo
+        from rapidfuzz import fuzz, process
+
+        scores = process.cdist(tokens, self.vocab, scorer=fuzz.ratio, score_cutoff=self.threshold, dtype=np.float32)
+        best = scores.argmax(axis=1)
+        found = scores[np.arange(len(tokens)), best] > 0
+        with self._lock:
+            # copy-on-write: o dicionário publicado nunca é alterado, então correct() lê sem trava
+            if len(self._memo) + len(tokens) > self.memo_size:
+                memo = {tok: None for tok in self.vocab}
+            else:
+                memo = dict(self._memo)
+            for tok, idx, ok in zip(tokens, best.tolist(), found.tolist()):
+                memo[tok] = self.vocab[idx] if ok else None
+            self._memo = memo
+        return memo
+
+    def correct(self, norm: str, learned: bool = False) -> str:
+        """Texto com os tokens corrigidos; `learned` indica que o lote já passou por learn()."""
+        tokens = WORD_RE.findall(norm)
+        memo = self._memo
+        if not learned and self._candidates(tokens):
+            memo = self.learn((norm,))
+        if not any(memo.get(tok) for tok in tokens):
+            return norm
+        return WORD_RE.sub(lambda m: memo.get(m.group()) or m.group(), norm)
+
+
+class Lexicon:
+    """Snapshot imutável do léxico (arquivo JSON) já compilado: autômato de keywords, sentimento e stopwords."""
+
+    SCORE_KEYS = ("positive", "negativeStrong", "negative", "sentimentTerms", "sentimentIntensifiers")
+    TERM_KEYS = (
+        "stopwords",
+        "neutral",
+        "forceNegative",
+        "excludePositive",
+        "negHints",
+        "negationTokens",
+        "sentimentNegators",
+    )
 
-    positive_terms = {
-        "empatia": 0.8,
-        "respeito": 0.8,
-        "ajuda": 0.6,
-        "apoio": 0.6,
-        "acolhimento": 0.75,
-        "rapido": 0.65,
-        "rapida": 0.65,
-        "agil": 0.65,
-        "agilidade": 0.7,
-        "clareza": 0.65,
-        "claro": 0.6,
-        "organizado": 0.65,
-        "organizada": 0.65,
-        "disponivel": 0.6,
-        "disponibilidade": 0.6,
-        "atencioso": 0.7,
-        "atenciosa": 0.7,
-        "compreensivo": 0.65,
-        "bem explicado": 0.7,
-        "bom atendimento": 0.7,
-        "escuta": 0.6,
-        "cuidado": 0.7,
-    }
+    def __init__(self, data: Dict[str, Any]):
+        self.validate(data)
+        self.data = data
+        self.name = str(data.get("name") or "")
+        self.stopwords = frozenset(data["stopwords"])
+        self.neg_hints = frozenset(data["negHints"])
+        self.keywords = KeywordLexicon(
+            data["positive"],
+            data["negativeStrong"],
+            data["negative"],
+            set(data["neutral"]),
+            force_negative={normalize(t) for t in data["forceNegative"]},
+            exclude_positive={normalize(t) for t in data["excludePositive"]},
+        )
+        self.sentiment = SentimentEngine.from_lexicons(
+            data["sentimentTerms"],
+            (data["positive"], data["negativeStrong"], data["negative"]),
+            self.neg_hints,
+            set(data["sentimentNegators"]) | {normalize(t) for t in data["negationTokens"] if " " not in t},
+            data["sentimentIntensifiers"],
+        )
+        self.fuzzy: Optional[FuzzyCorrector] = None
+        if FUZZY_MATCH_THRESHOLD > 0:
+            terms = (*data["positive"], *data["negativeStrong"], *data["negative"])
+            self.fuzzy = FuzzyCorrector(
+                (tok for term in terms for tok in WORD_RE.findall(normalize(term))),
+                FUZZY_MATCH_THRESHOLD,
+                FUZZY_MIN_TOKEN_LEN,
+                FUZZY_MEMO_SIZE,
+            )
+        # Impressão digital do léxico: muda sempre que algum termo/score muda (usada como chave de cache e do
+        # armazém). Com fuzzy ligado a configuração entra junto, porque muda o resultado da extração.
+        content: Dict[str, Any] = {k: v for k, v in data.items() if k != "name"}
+        if self.fuzzy is not None:
+            content["_fuzzy"] = [FUZZY_MATCH_THRESHOLD, FUZZY_MIN_TOKEN_LEN]
+        fingerprint = json.dumps(content, sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+    @classmethod
+    def validate(cls, data: Any) -> None:
+        if not isinstance(data, dict):
+            raise ValueError("léxico deve ser um objeto JSON")
+        for key in cls.SCORE_KEYS:
+            terms = data.get(key)
+            if not isinstance(terms, dict) or not all(
+                isinstance(t, str) and isinstance(s, (int, float)) and not isinstance(s, bool) for t, s in terms.items()
+            ):
+                raise ValueError(f"'{key}' deve ser um objeto termo -> número")
+        for key in cls.TERM_KEYS:
+            terms = data.get(key)
+            if not isinstance(terms, list) or not all(isinstance(t, str) for t in terms):
+                raise ValueError(f"'{key}' deve ser uma lista de termos")
+
+    @classmethod
+    def from_file(cls, path: str) -> "Lexicon":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "name": self.name,
+            **{key: len(self.data[key]) for key in (*self.SCORE_KEYS, *self.TERM_KEYS)},
+        }
+
+
+def lexicon_path() -> str:
+    if os.path.isabs(LEXICON_PATH):
+        return LEXICON_PATH
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), LEXICON_PATH)
+
+
+class LexiconRegistry:
+    """Léxico ativo com troca atômica: cada requisição pega um snapshot e termina nele, mesmo durante um reload."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.current = Lexicon.from_file(path)
+        self.loaded_at = time.time()
+        self._mtime = self._file_mtime()
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
 
-    negative_terms_strong = {
-        "preconceito": -0.85,
-        "racismo": -0.9,
-        "discriminacao": -0.85,
-        "discriminação": -0.85,
-        "assédio": -0.9,
-        "assedio": -0.9,
-        "violencia": -0.9,
-        "violência": -0.9,
-    }
+    def install(self, lexicon: Lexicon) -> bool:
+        with self._lock:
+            previous = self.current
+            self.current = lexicon
+            self.loaded_at = time.time()
+        if previous.version == lexicon.version:
+            return False
+        # entradas da versão anterior nunca mais seriam lidas (a chave inclui a versão). O segmento mmap é
+        # comum a todos os workers e cada um instala o léxico pelo seu watcher: limpar ali apagaria N vezes
+        # o que os outros já gravaram com a versão nova; as entradas antigas saem pela substituição normal
+        if not isinstance(extraction_cache, SharedExtractionCache):
+            extraction_cache.clear()
+        print(f"[ai] Léxico {previous.version} -> {lexicon.version} ({lexicon.name or 'sem nome'}).")
+        return True
 
-    negative_terms = {
-        "problema": -0.8,
-        "demora": -0.6,
-        "demorado": -0.6,
-        "demorada": -0.6,
-        "lento": -0.6,
-        "lenta": -0.6,
-        "atraso": -0.65,
-        "atrasos": -0.65,
-        "descaso": -0.7,
-        "falha": -0.65,
-        "erro": -0.65,
-        "desorganizado": -0.6,
-        "desorganizada": -0.6,
-        "lotado": -0.6,
-        "barulho": -0.6,
-        "inseguranca": -0.7,
-        "falta de retorno": -0.75,
-        "sem resposta": -0.7,
-        "falta": -0.5,
-        "cancelar": -0.5,
-        "trancar": -0.55,
-        "abandono": -0.65,
-        "sair": -0.45,
-    }
+    def reload(self) -> Lexicon:
+        """Relê o arquivo; em caso de erro mantém o léxico atual e propaga a exceção."""
+        self._mtime = self._file_mtime()
+        lexicon = Lexicon.from_file(self.path)
+        self.install(lexicon)
+        return lexicon
+
+    def replace(self, data: Dict[str, Any]) -> Lexicon:
+        """Valida, grava o arquivo de forma atômica (para sobreviver a restarts) e ativa o novo léxico."""
+        lexicon = Lexicon(data)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False, indent=2)
+            fh.write("\n")
+        os.replace(tmp, self.path)
+        self._mtime = self._file_mtime()
+        self.install(lexicon)
+        return lexicon
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._file_mtime()
+            if mtime is None or mtime == self._mtime:
+                continue
+            try:
+                self.reload()
+            except (OSError, ValueError) as ex:
+                print(f"[ai] Léxico alterado mas inválido ({ex!r}); mantendo {self.current.version}.")
+
+
+startup.mark("module")
+lexicons = LexiconRegistry(lexicon_path())
+startup.mark("lexicon")
+
+
+class LRUCache:
+    """Cache LRU limitado e thread-safe, com contadores de hit/miss e TTL opcional (segundos)."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Any, value: Any) -> None:
+        if not self.maxsize:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def text_digest(norm: str) -> bytes:
+    """Hash do texto normalizado: chave dos caches por texto e id das linhas por texto no armazém."""
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=16).digest()
+
+
+class ExtractionCache(LRUCache):
+    """Cache LRU de extrações por texto, endereçado pelo hash do texto normalizado + versão do léxico."""
+
+    @staticmethod
+    def key(digest: bytes, version: str) -> Tuple[str, bytes]:
+        return version, digest
+
+
+class SharedExtractionCache:
+    """Cache de extrações numa região mmap anônima compartilhada, visível a todos os workers forkados depois dela.
+
+    Tabela associativa de 4 vias com registros de tamanho fixo (chave, tamanho, checksum, payload). Não há
+    trava entre processos: a leitura confere o checksum, então uma escrita concorrente vira no máximo um miss.
+    """
+
+    RECORD = 256
+    WAYS = 4
+    HEADER = struct.Struct("<16sH8s")
+
+    def __init__(self, size_mb: int):
+        self.sets = max(1, size_mb * 1024 * 1024 // (self.RECORD * self.WAYS))
+        self.maxsize = self.sets * self.WAYS
+        # mmap anônimo é MAP_SHARED: páginas compartilhadas (não copiadas) pelos processos filhos
+        self._buf = mmap.mmap(-1, self.maxsize * self.RECORD)
+        # contadores por processo (cada worker expõe os seus no /metrics)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(digest: bytes, version: str) -> bytes:
+        return hashlib.blake2b(digest, digest_size=16, person=version.encode()[:16]).digest()
+
+    @staticmethod
+    def _checksum(key: bytes, payload: bytes) -> bytes:
+        return hashlib.blake2b(key + payload, digest_size=8).digest()
+
+    def _offsets(self, key: bytes) -> range:
+        first = int.from_bytes(key[:8], "little") % self.sets * self.WAYS
+        return range(first * self.RECORD, (first + self.WAYS) * self.RECORD, self.RECORD)
+
+    def get(self, key: bytes) -> Optional[Tuple[Tuple[str, float], ...]]:
+        head = self.HEADER.size
+        for off in self._offsets(key):
+            slot_key, size, check = self.HEADER.unpack_from(self._buf, off)
+            if slot_key != key or not size:
+                continue
+            payload = self._buf[off + head : off + head + size - 1]
+            if self._checksum(key, payload) != check:
+                break
+            self.hits += 1
+            if not payload:
+                return ()
+            return tuple(
+                (kw, float(sc)) for kw, sc in (item.split("\x1e") for item in payload.decode("utf-8").split("\x1f"))
+            )
+        self.misses += 1
+        return None
 
-    neutral_terms = {
-        "curso",
-        "aulas",
-        "instituicao",
-        "universidade",
-        "turma",
-        "aluno",
-        "alunos",
-        "professor",
-        "profa",
-        "coordenacao",
-        "coordenador",
-        "coordenadora",
-        "email",
-        "e-mail",
-        "whatsapp",
-        "telefone",
-        "site",
-        "portal",
-        "plataforma",
-        "acoes",
-        "acoes",
-        "politicas",
-        "politica",
-        "medidas",
-        "situacao",
-        "caso",
-        "processo",
-        "area",
-        "areas",
-        "sinto",
-        "vejo",
-        "considerar",
-        "houver",
-        "acontecer",
-        "usar",
-    }
+    def put(self, key: bytes, value: Tuple[Tuple[str, float], ...]) -> None:
+        payload = "\x1f".join(f"{kw}\x1e{sc!r}" for kw, sc in value).encode("utf-8")
+        head = self.HEADER.size
+        if head + len(payload) > self.RECORD:
+            return
+        offsets = self._offsets(key)
+        target = offsets[key[8] % self.WAYS]
+        for off in offsets:
+            slot_key, size, _ = self.HEADER.unpack_from(self._buf, off)
+            if slot_key == key or not size:
+                target = off
+                break
+        # tamanho guardado como len+1 para distinguir extração vazia de slot livre
+        record = self.HEADER.pack(key, len(payload) + 1, self._checksum(key, payload)) + payload
+        self._buf[target : target + len(record)] = record
+
+    def clear(self) -> None:
+        step = 1024 * 1024
+        zeros = bytes(step)
+        for off in range(0, len(self._buf), step):
+            end = min(off + step, len(self._buf))
+            self._buf[off:end] = zeros[: end - off]
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        rows = np.frombuffer(self._buf, dtype=np.uint8).reshape(self.maxsize, self.RECORD)
+        lookups = self.hits + self.misses
+        return {
+            "size": int(np.count_nonzero(rows[:, 16] | rows[:, 17])),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+extraction_cache: Any = (
+    SharedExtractionCache(EXTRACTION_SHARED_CACHE_MB)
+    if EXTRACTION_SHARED_CACHE_MB > 0
+    else ExtractionCache(KEYWORD_CACHE_SIZE)
+)
+
+
+def extract_from_normalized(norm: str, lexicon: Optional[Lexicon] = None) -> Tuple[Tuple[str, float], ...]:
+    found = (lexicon or lexicons.current).keywords.match(norm)
 
-    negation_tokens = {"sem", "falta", "falta de", "nao", "não"}
+    # Remove duplicatas mantendo o score mais intenso (neutros já saem na compilação do léxico)
+    scored: Dict[str, float] = {}
+    for kw, sc in found:
+        prev = scored.get(kw)
+        if prev is None or abs(sc) > abs(prev):
+            scored[kw] = sc
 
-    def tokenize(txt: str) -> List[str]:
-        return re.findall(r"[a-zà-ú]{3,}", txt, flags=re.IGNORECASE)
+    return tuple((kw, sc) for kw, sc in scored.items() if abs(sc) >= 0.05)
 
-    def extract_from_text(text: str) -> List[Tuple[str, float]]:
+
+def extract_from_text(text: str, lexicon: Optional[Lexicon] = None) -> Tuple[Tuple[str, float], ...]:
+    if not text or len(text.strip()) < 3:
+        return ()
+    lexicon = lexicon or lexicons.current
+    norm = normalize(text)
+    if lexicon.fuzzy is not None:
+        norm = lexicon.fuzzy.correct(norm)
+    return extract_cached(norm, lexicon)
+
+
+def extract_cached(norm: str, lexicon: Optional[Lexicon] = None) -> Tuple[Tuple[str, float], ...]:
+    lexicon = lexicon or lexicons.current
+    digest = text_digest(norm)
+    key = extraction_cache.key(digest, lexicon.version)
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        return cached
+    result = extract_from_normalized(norm, lexicon)
+    extraction_cache.put(key, result)
+    persist_later("text_keywords", [(digest.hex(), lexicon.version, result)])
+    return result
+
+
+class KeywordColumns:
+    """Agregado colunar: rótulos internados + arrays alinhados por linha, na ordem da primeira ocorrência."""
+
+    def __init__(
+        self,
+        weeks: List[str],
+        cats: List[Optional[str]],
+        keywords: List[str],
+        week: np.ndarray,
+        cat: np.ndarray,
+        kw: np.ndarray,
+        count: np.ndarray,
+        score_sum: np.ndarray,
+    ):
+        self.weeks = weeks
+        self.cats = cats
+        self.keywords = keywords
+        self.week = week
+        self.cat = cat
+        self.kw = kw
+        self.count = count
+        self.score_sum = score_sum
+
+    @classmethod
+    def from_items(cls, agg: Iterable[Tuple[tuple, Dict[str, float]]]) -> "KeywordColumns":
+        """Monta as colunas a partir de pares (week, categoryId, keyword) -> {count, score_sum}."""
+        builder = KeywordAggregator()
+        for (week, cat, kw), data in agg:
+            builder.append(week, cat, kw, data["count"], data["score_sum"])
+        return builder.columns()
+
+    def __len__(self) -> int:
+        return int(self.count.size)
+
+    def matrix(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Pivota em semanas × keywords (somando categorias): (semanas ordenadas, totais, soma de scores)."""
+        n_weeks, n_kws = len(self.weeks), len(self.keywords)
+        cell = self.week * n_kws + self.kw
+        totals = np.bincount(cell, weights=self.count, minlength=n_weeks * n_kws).reshape(n_weeks, n_kws)
+        scores = np.bincount(cell, weights=self.score_sum, minlength=n_weeks * n_kws).reshape(n_weeks, n_kws)
+        order = np.argsort(label_ranks(self.weeks))
+        return [self.weeks[i] for i in order], totals[order].astype(np.int64), scores[order]
+
+
+def label_ranks(labels: List[str]) -> np.ndarray:
+    """Posição de cada rótulo na ordem alfabética (para desempates por string dentro do NumPy)."""
+    ranks = np.empty(len(labels), dtype=np.int64)
+    ranks[sorted(range(len(labels)), key=labels.__getitem__)] = np.arange(len(labels))
+    return ranks
+
+
+class KeywordAggregator:
+    """Acumula (week, categoryId, keyword) -> count/score_sum em colunas NumPy, com códigos internados."""
+
+    # ocorrências acumuladas em listas antes de compactar nas colunas (limita a memória do streaming)
+    COMPACT_EVERY = 65536
+
+    def __init__(self, timings: Optional[Dict[str, float]] = None, lexicon: Optional[Lexicon] = None):
+        # snapshot do léxico: um reload no meio da agregação não mistura versões
+        self.lexicon = lexicon or lexicons.current
+        self.weeks: Dict[str, int] = {}
+        self.cats: Dict[Optional[str], int] = {}
+        self.keywords: Dict[str, int] = {}
+        self._pending: Tuple[List[int], List[int], List[int], List[float], List[float]] = ([], [], [], [], [])
+        self._week = self._cat = self._kw = np.zeros(0, dtype=np.int64)
+        self._count = np.zeros(0, dtype=np.int64)
+        self._score_sum = np.zeros(0, dtype=np.float64)
+        self.texts = 0
+        # segundos acumulados por etapa (normalize/match) para as métricas
+        self.timings: Dict[str, float] = timings if timings is not None else defaultdict(float)
+
+    def add(self, t: FeedbackText) -> None:
+        self.add_text(t.week, t.categoryId, t.text)
+
+    def add_text(self, week: str, cat: Optional[str], text: str, norm: Optional[str] = None) -> None:
+        self.add_extracted(week, cat, self.extract(text, norm))
+
+    def add_extracted(self, week: str, cat: Optional[str], kws: Tuple[Tuple[str, float], ...]) -> None:
+        self.texts += 1
+        for kw, sc in kws:
+            self.append(week, cat, kw, 1, sc)
+
+    def extract(self, text: str, norm: Optional[str] = None) -> Tuple[Tuple[str, float], ...]:
+        """normalize -> fuzzy -> match (via cache de extrações), acumulando o tempo de cada etapa."""
         if not text or len(text.strip()) < 3:
-            return []
-        norm = normalize(text)
-        tokens = tokenize(norm)
-        joined = " ".join(tokens)
-        found: List[Tuple[str, float]] = []
+            return ()
+        clock = time.perf_counter
+        start = clock()
+        learned = norm is not None
+        if norm is None:
+            norm = normalize(text)
+        normalized = clock()
+        self.timings["normalize"] += normalized - start
+        if self.lexicon.fuzzy is not None:
+            norm = self.lexicon.fuzzy.correct(norm, learned)
+            corrected = clock()
+            self.timings["fuzzy"] += corrected - normalized
+            normalized = corrected
+        kws = extract_cached(norm, self.lexicon)
+        self.timings["match"] += clock() - normalized
+        return kws
+
+    def extract_texts(self, texts: List[str]) -> List[Tuple[Tuple[str, float], ...]]:
+        fuzzy = self.lexicon.fuzzy
+        if fuzzy is None:
+            return [self.extract(text) for text in texts]
+        # lote inteiro normalizado antes, para o fuzzy resolver todos os tokens novos numa só chamada
+        start = time.perf_counter()
+        norms = [normalize(text) if text else "" for text in texts]
+        learned = time.perf_counter()
+        fuzzy.learn(norms)
+        self.timings["normalize"] += learned - start
+        self.timings["fuzzy"] += time.perf_counter() - learned
+        return [self.extract(text, norm) for text, norm in zip(texts, norms)]
+
+    def append(self, week: str, cat: Optional[str], kw: str, count: float, score_sum: float) -> None:
+        weeks, cats, keywords, counts, scores = self._pending
+        weeks.append(self.weeks.setdefault(week, len(self.weeks)))
+        cats.append(self.cats.setdefault(cat, len(self.cats)))
+        keywords.append(self.keywords.setdefault(kw, len(self.keywords)))
+        counts.append(count)
+        scores.append(score_sum)
+        if len(weeks) >= self.COMPACT_EVERY:
+            self._compact()
+
+    def consume(self, texts: Iterable[FeedbackText]) -> "KeywordAggregator":
+        return self.consume_rows((t.week, t.categoryId, t.text) for t in texts)
+
+    def consume_rows(self, rows: Iterable[Tuple[str, Optional[str], str]]) -> "KeywordAggregator":
+        rows = list(rows)
+        for (week, cat, _), kws in zip(rows, self.extract_texts([text for _, _, text in rows])):
+            self.add_extracted(week, cat, kws)
+        return self
+
+    def _compact(self) -> None:
+        """Junta colunas + pendentes e reagrupa por chave; bincount soma na ordem de chegada."""
+        weeks, cats, keywords, counts, scores = self._pending
+        parts = [
+            (self._week, self._cat, self._kw, self._count, self._score_sum),
+            (
+                np.asarray(weeks, dtype=np.int64),
+                np.asarray(cats, dtype=np.int64),
+                np.asarray(keywords, dtype=np.int64),
+                np.asarray(counts, dtype=np.int64),
+                np.asarray(scores, dtype=np.float64),
+            ),
+        ]
+        self._pending = ([], [], [], [], [])
+        week, cat, kw, count, score_sum = (np.concatenate(col) for col in zip(*parts))
+        key = (week * max(1, len(self.cats)) + cat) * max(1, len(self.keywords)) + kw
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        # np.unique ordena pelas chaves; reordena pela 1ª ocorrência para manter o desempate estável
+        order = np.argsort(first, kind="stable")
+        slot = np.empty_like(order)
+        slot[order] = np.arange(order.size)
+        slot = slot[inverse.reshape(-1)]
+        rows = first[order]
+        self._week, self._cat, self._kw = week[rows], cat[rows], kw[rows]
+        self._count = np.bincount(slot, weights=count, minlength=order.size).astype(np.int64)
+        self._score_sum = np.bincount(slot, weights=score_sum, minlength=order.size)
+
+    def columns(self) -> KeywordColumns:
+        if self._pending[0]:
+            self._compact()
+        return KeywordColumns(
+            list(self.weeks),
+            list(self.cats),
+            list(self.keywords),
+            self._week,
+            self._cat,
+            self._kw,
+            self._count,
+            self._score_sum,
+        )
 
-        # Negação explícita: "falta de X" para termos positivos -> negativa
-        for pkw, pscore in positive_terms.items():
-            if f"falta de {pkw}" in norm or f"sem {pkw}" in norm:
-                found.append((f"falta de {pkw}", min(-0.05, -abs(pscore) * 1.0)))
+    def response(self, top: int, min_freq: int, rank: str = "global") -> KeywordResponse:
+        start = time.perf_counter()
+        cols = self.columns()
+        self.timings["aggregate"] += time.perf_counter() - start
+        return build_keyword_response(cols, top, min_freq, self.timings, rank)
 
-        # Positivos
-        for pkw, pscore in positive_terms.items():
-            if pkw in neutral_terms:
-                continue
-            if any(ntok in norm for ntok in ("falta de " + pkw, "sem " + pkw)):
-                continue
-            if pkw in norm:
-                found.append((pkw, max(0.05, pscore)))
-
-        # Negativos fortes
-        for nkw, nscore in negative_terms_strong.items():
-            if nkw in norm:
-                found.append((nkw, nscore))
-
-        # Negativos moderados
-        for nkw, nscore in negative_terms.items():
-            if nkw in norm:
-                found.append((nkw, nscore))
-
-        # Remove neutros e duplicatas mantendo o score mais intenso
-        scored: Dict[str, float] = {}
-        for kw, sc in found:
-            if kw in neutral_terms:
-                continue
-            prev = scored.get(kw)
-            if prev is None or abs(sc) > abs(prev):
-                scored[kw] = sc
 
-        return [(kw, sc) for kw, sc in scored.items() if abs(sc) >= 0.05]
+_keyword_pool: Optional[ProcessPoolExecutor] = None
+_keyword_pool_lock = threading.Lock()
 
-    agg: Dict[tuple, Dict[str, float]] = defaultdict(lambda: {"count": 0, "score_sum": 0.0})
 
-    for t in payload.texts:
-        kws = extract_from_text(t.text)
-        if not kws:
-            continue
-        for kw, sc in kws:
-            key = (t.week, t.categoryId, kw)
-            agg[key]["count"] += 1
-            agg[key]["score_sum"] += sc
-
-    pos_items: List[HeatItem] = []
-    neg_items: List[HeatItem] = []
-    for (week, cat, kw), data in agg.items():
-        if data["count"] < payload.min_freq:
+def _init_keyword_worker() -> None:
+    """Inicializador dos workers: compila o léxico antes da primeira tarefa."""
+    global result_store
+    # quem grava no armazém é o processo principal, ao receber os resultados
+    result_store = None
+    lexicons.current.keywords.match("")
+
+
+def start_keyword_pool() -> Optional[ProcessPoolExecutor]:
+    """Cria (uma vez) o pool persistente de extração; None quando KEYWORD_WORKERS=0."""
+    global _keyword_pool
+    if KEYWORD_WORKERS <= 0:
+        return None
+    with _keyword_pool_lock:
+        if _keyword_pool is None:
+            _keyword_pool = ProcessPoolExecutor(
+                max_workers=KEYWORD_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_keyword_worker,
+            )
+            # Sobe os workers já no startup para o primeiro request não pagar o spawn
+            for _ in range(KEYWORD_WORKERS):
+                _keyword_pool.submit(_init_keyword_worker)
+        return _keyword_pool
+
+
+def shutdown_keyword_pool() -> None:
+    global _keyword_pool
+    with _keyword_pool_lock:
+        if _keyword_pool is not None:
+            _keyword_pool.shutdown(wait=False, cancel_futures=True)
+            _keyword_pool = None
+
+
+def aggregate_chunk(
+    texts: List[str], lexicon_version: str, lexicon_data: Dict[str, Any]
+) -> List[Tuple[Tuple[str, float], ...]]:
+    """Executado no worker: extrai as keywords de um pedaço de textos (um resultado por texto, na ordem)."""
+    # o worker carregou o léxico do arquivo no spawn; acompanha o processo principal após um reload
+    if lexicons.current.version != lexicon_version:
+        lexicons.install(Lexicon(lexicon_data))
+    return KeywordAggregator().extract_texts(texts)
+
+
+def aggregate_parallel(texts: List[FeedbackText], timings: Dict[str, float]) -> Optional[KeywordAggregator]:
+    pool = start_keyword_pool()
+    if pool is None or len(texts) < max(1, KEYWORD_PARALLEL_MIN_BATCH):
+        return None
+    start = time.perf_counter()
+    aggregator = KeywordAggregator(timings)
+    lexicon = aggregator.lexicon
+    results: List[Optional[Tuple[Tuple[str, float], ...]]] = [None] * len(texts)
+    digests: List[Optional[bytes]] = [None] * len(texts)
+    misses: List[int] = []
+    for i, t in enumerate(texts):
+        if not t.text or len(t.text.strip()) < 3:
+            results[i] = ()
             continue
-        avg_score = data["score_sum"] / max(1.0, data["count"])
-        target = pos_items if avg_score > 0 else neg_items
-        target.append(
+        if lexicon.fuzzy is None:
+            # sem fuzzy a chave do cache sai só da normalização: consulta aqui e manda aos workers só as faltas
+            digests[i] = text_digest(normalize(t.text))
+            cached = extraction_cache.get(extraction_cache.key(digests[i], lexicon.version))
+            if cached is not None:
+                results[i] = cached
+                continue
+        misses.append(i)
+    size = -(-len(misses) // (KEYWORD_WORKERS * 2)) or 1
+    chunks = [misses[i : i + size] for i in range(0, len(misses), size)]
+    n = len(chunks)
+    try:
+        partials = pool.map(
+            aggregate_chunk, [[texts[i].text for i in chunk] for chunk in chunks], [lexicon.version] * n, [lexicon.data] * n
+        )
+        fresh: List[Tuple[str, str, Any]] = []
+        for chunk, extracted in zip(chunks, partials):
+            for i, kws in zip(chunk, extracted):
+                results[i] = kws
+                if digests[i] is not None:
+                    extraction_cache.put(extraction_cache.key(digests[i], lexicon.version), kws)
+                    fresh.append((digests[i].hex(), lexicon.version, kws))
+        persist_later("text_keywords", fresh)
+    except BrokenProcessPool as ex:
+        print(f"[ai] Pool de keywords indisponível ({ex!r}); processando em modo serial.")
+        shutdown_keyword_pool()
+        return None
+    extracted_at = time.perf_counter()
+    timings["parallel_extract"] += extracted_at - start
+    # agrega no processo principal na ordem dos textos: mesmas somas e mesmo desempate do modo serial
+    for t, kws in zip(texts, results):
+        aggregator.add_extracted(t.week, t.categoryId, kws)
+    timings["aggregate"] += time.perf_counter() - extracted_at
+    return aggregator
+
+
+def aggregate_keywords(payload: KeywordRequest, timings: Optional[Dict[str, float]] = None) -> KeywordResponse:
+    """Extrai keywords positivas/negativas com regras de sentimento e filtragem de termos neutros."""
+    timings = timings if timings is not None else defaultdict(float)
+    start = time.perf_counter()
+    aggregator = aggregate_parallel(payload.texts, timings)
+    if aggregator is None:
+        aggregator = KeywordAggregator(timings).consume(payload.texts)
+        timings["aggregate"] += (
+            time.perf_counter() - start - timings["normalize"] - timings["match"] - timings.get("fuzzy", 0.0)
+        )
+    return aggregator.response(payload.top, payload.min_freq, payload.rank)
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], min_lines: int = 512) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """Quebra um corpo NDJSON em lotes de linhas (nº da linha, bytes) à medida que os bytes chegam.
+
+    Só separa linhas; parse e extração ficam para quem consome (fora do event loop).
+    """
+    buffer = b""
+    lineno = 0
+    batch: List[Tuple[int, bytes]] = []
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            lineno += 1
+            if line.strip():
+                batch.append((lineno, line))
+        if len(batch) >= min_lines:
+            yield batch
+            batch = []
+    if buffer.strip():
+        batch.append((lineno + 1, buffer))
+    if batch:
+        yield batch
+
+
+def parse_ndjson_text(line: bytes, lineno: int) -> FeedbackText:
+    try:
+        return FeedbackText(**json.loads(line))
+    except Exception as ex:
+        raise HTTPException(status_code=422, detail=f"Linha {lineno} inválida no NDJSON: {ex}")
+
+
+def consume_ndjson_lines(aggregator: "KeywordAggregator", lines: List[Tuple[int, bytes]]) -> None:
+    aggregator.consume(parse_ndjson_text(line, lineno) for lineno, line in lines)
+
+
+def build_keyword_response(
+    cols: KeywordColumns,
+    top: int,
+    min_freq: int,
+    timings: Optional[Dict[str, float]] = None,
+    rank: str = "global",
+) -> KeywordResponse:
+    """Converte o agregado colunar (week, categoryId, keyword) no ranking pos/neg do heatmap."""
+    clock = time.perf_counter
+    start = clock()
+    avg = cols.score_sum / np.maximum(cols.count, 1)
+    keep = cols.count >= min_freq
+    positive = avg > 0
+    built = clock()
+    pos_rows = rank_rows(cols, np.flatnonzero(keep & positive), -avg, top, rank)
+    neg_rows = rank_rows(cols, np.flatnonzero(keep & ~positive), avg, top, rank)
+    ranked = clock()
+
+    # só as linhas que sobreviveram ao corte viram HeatItem
+    def items(rows: np.ndarray) -> List[HeatItem]:
+        return [
             HeatItem(
-                week=week,
-                categoryId=cat,
-                keyword=kw,
-                total=int(data["count"]),
-                score=float(avg_score),
+                week=cols.weeks[cols.week[i]],
+                categoryId=cols.cats[cols.cat[i]],
+                keyword=cols.keywords[cols.kw[i]],
+                total=int(cols.count[i]),
+                score=float(avg[i]),
             )
-        )
+            for i in rows
+        ]
+
+    response = KeywordResponse(pos=items(pos_rows), neg=items(neg_rows))
+    if timings is not None:
+        timings["aggregate"] += built - start + clock() - ranked
+        timings["sort"] += ranked - built
+    return response
+
+
+def rank_rows(cols: KeywordColumns, idx: np.ndarray, score_key: np.ndarray, top: int, rank: str) -> np.ndarray:
+    """Top N de `idx` por (-total, score_key, keyword, 1ª ocorrência); com rank="week" o corte é por semana."""
+    if top <= 0 or idx.size == 0:
+        return idx[:0]
+    counts = cols.count[idx]
+    if rank != "week" and top < idx.size:
+        # só entra no top quem empata ou supera o total do N-ésimo colocado
+        kth = np.partition(counts, idx.size - top)[idx.size - top]
+        idx = idx[counts >= kth]
+        counts = cols.count[idx]
+    keys = [idx, label_ranks(cols.keywords)[cols.kw[idx]], score_key[idx], -counts]
+    if rank != "week":
+        return idx[np.lexsort(keys)][:top]
+    week_rank = label_ranks(cols.weeks)[cols.week[idx]]
+    order = np.lexsort(keys + [week_rank])
+    groups = week_rank[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    position = np.arange(order.size) - np.repeat(starts, np.diff(np.r_[starts, order.size]))
+    return idx[order[position < top]]
+
+
+class ResultStore:
+    """Armazém local (SQLite em WAL) de resultados por feedback, com a versão de léxico/modelo que os gerou."""
+
+    # SQLite limita o nº de parâmetros por consulta; lookups grandes são quebrados neste tamanho.
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect()
+        # conexões SQLite não podem atravessar um fork (gunicorn com preload): o filho abre a sua
+        os.register_at_fork(after_in_child=self._connect)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback_results ("
+                " id TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, id))"
+            )
+
+    def _connect(self) -> None:
+        """Conexão, trava e gravador em segundo plano próprios do processo."""
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[Tuple[str, str, Any]]] = {}
+        self._pending_lock = threading.Lock()
+        self._flushing = False
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-store")
+
+    def put_many(self, kind: str, rows: Iterable[Tuple[str, str, Any]]) -> int:
+        """Grava (id, versão, payload JSON) numa única transação; sobrescreve resultados anteriores do id."""
+        now = time.time()
+        data = [(fid, kind, version, json.dumps(payload, ensure_ascii=False), now) for fid, version, payload in rows]
+        if not data:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO feedback_results (id, kind, version, payload, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    data,
+                )
+        return len(data)
+
+    def get_many(self, kind: str, ids: List[str], versions: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Busca em lote por lista de ids; ignora resultados gerados por versões não aceitas."""
+        out: Dict[str, Any] = {}
+        unique = list(dict.fromkeys(ids))
+        with self._lock:
+            for i in range(0, len(unique), self.LOOKUP_CHUNK):
+                chunk = unique[i : i + self.LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"SELECT id, version, payload FROM feedback_results WHERE kind = ? AND id IN ({marks})",
+                    [kind, *chunk],
+                )
+                for fid, version, payload in cur:
+                    if versions is None or version in versions:
+                        out[fid] = json.loads(payload)
+        return out
+
+    def put_later(self, kind: str, rows: Iterable[Tuple[str, str, Any]]) -> None:
+        """Enfileira para o gravador em segundo plano, que junta tudo o que chegou numa transação por tipo."""
+        with self._pending_lock:
+            self._pending.setdefault(kind, []).extend(rows)
+            if self._flushing:
+                return
+            self._flushing = True
+        self._writer.submit(self._write_behind)
+
+    # O gravador espera esta janela antes de gravar: as linhas de um request inteiro viram uma transação
+    # e a serialização não disputa a CPU com o request que ainda está calculando.
+    WRITE_DELAY_SECONDS = 1.0
+
+    def _write_behind(self) -> None:
+        time.sleep(self.WRITE_DELAY_SECONDS)
+        self.flush()
+
+    def flush(self) -> None:
+        """Grava o que está na fila (chamado pelo gravador; no shutdown, direto para não perder nada)."""
+        while True:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                if not pending:
+                    self._flushing = False
+                    return
+            for kind, rows in pending.items():
+                try:
+                    self.put_many(kind, rows)
+                except sqlite3.Error as ex:
+                    print(f"[ai] Falha ao gravar {len(rows)} resultados ({kind}) no armazém: {ex!r}")
+
+    def iter_kind(self, kind: str, version: str, limit: Optional[int] = None) -> List[Tuple[str, Any]]:
+        """Linhas da versão em ordem de gravação; com `limit`, só as mais recentes."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM feedback_results WHERE kind = ? AND version = ? ORDER BY rowid DESC LIMIT ?",
+                (kind, version, -1 if limit is None else limit),
+            ).fetchall()
+        rows.reverse()
+        return [(fid, json.loads(payload)) for fid, payload in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, COUNT(*) FROM feedback_results GROUP BY kind").fetchall()
+        return {"path": self.path, "rows": dict(rows)}
+
+
+def open_result_store() -> Optional[ResultStore]:
+    if not RESULT_STORE_PATH:
+        return None
+    path = RESULT_STORE_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    try:
+        return ResultStore(path)
+    except sqlite3.Error as ex:
+        print(f"[ai] Armazém local indisponível ({ex!r}); seguindo só com memória.")
+        return None
+
+
+startup.mark("module")
+result_store = open_result_store()
+startup.mark("result_store")
+
+
+def persist_later(kind: str, rows: List[Tuple[str, str, Any]]) -> None:
+    """Grava resultados novos no armazém em segundo plano (nada a fazer com o armazém desligado)."""
+    if result_store is not None and rows:
+        result_store.put_later(kind, rows)
+
+
+# Sentimento por (versão do léxico, hash do texto normalizado): o /sentiment só pontua textos novos.
+sentiment_cache = LRUCache(SENTIMENT_CACHE_SIZE)
 
-    pos_items.sort(key=lambda i: (-i.total, -i.score, i.keyword))
-    neg_items.sort(key=lambda i: (-i.total, i.score, i.keyword))
 
-    return KeywordResponse(pos=pos_items[: payload.top], neg=neg_items[: payload.top])
+def cached_sentiment_scores(texts: List[str]) -> List[float]:
+    version = lexicons.current.version
+    keys = [(version, text_digest(normalize(text))) for text in texts]
+    scores = [sentiment_cache.get(key) for key in keys]
+    fresh = [i for i, sc in enumerate(scores) if sc is None]
+    if fresh:
+        rows: List[Tuple[str, str, Any]] = []
+        for i, sc in zip(fresh, compute_sentiment_batch([texts[i] for i in fresh]).tolist()):
+            scores[i] = sc
+            sentiment_cache.put(keys[i], sc)
+            rows.append((keys[i][1].hex(), version, sc))
+        persist_later("text_sentiment", rows)
+    return scores
+
+
+def warm_result_caches(store: ResultStore) -> Tuple[int, int]:
+    """Recarrega nos caches em memória as extrações e sentimentos mais recentes da versão atual do léxico.
+
+    O armazém só é lido aqui, no startup: no request os caches em memória respondem e as faltas são calculadas.
+    """
+    version = lexicons.current.version
+    extracted = store.iter_kind("text_keywords", version, limit=extraction_cache.maxsize)
+    for digest, kws in extracted:
+        key = extraction_cache.key(bytes.fromhex(digest), version)
+        extraction_cache.put(key, tuple((kw, float(sc)) for kw, sc in kws))
+    scored = store.iter_kind("text_sentiment", version, limit=sentiment_cache.maxsize)
+    for digest, score in scored:
+        sentiment_cache.put((version, bytes.fromhex(digest)), float(score))
+    return len(extracted), len(scored)
+
+
+class KeywordRollups:
+    """Agregados incrementais (week, categoryId) -> keyword -> {count, score_sum}, idempotentes por id."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, Optional[str]], Dict[str, Dict[str, float]]] = {}
+        # id -> (week, categoryId, keywords extraídas, versão do léxico) para ignorar reenvios e corrigir
+        # textos editados; após um reload do léxico, o reenvio de um texto conta como atualização
+        self._docs: Dict[str, Tuple[str, Optional[str], Tuple[Tuple[str, float], ...], str]] = {}
+        self._versions: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _apply(self, week: str, cat: Optional[str], kws: Tuple[Tuple[str, float], ...], sign: int) -> None:
+        bucket = self._buckets.setdefault((week, cat), {})
+        for kw, sc in kws:
+            data = bucket.setdefault(kw, {"count": 0, "score_sum": 0.0})
+            data["count"] += sign
+            data["score_sum"] += sign * sc
+            if data["count"] <= 0:
+                del bucket[kw]
+        if not bucket:
+            del self._buckets[(week, cat)]
+
+    def _add(self, fid: str, doc: Tuple[str, Optional[str], Tuple[Tuple[str, float], ...], str]) -> None:
+        self._docs[fid] = doc
+        self._versions[doc[3]] += 1
+        self._apply(doc[0], doc[1], doc[2], sign=1)
+
+    def _remove(self, doc: Tuple[str, Optional[str], Tuple[Tuple[str, float], ...], str]) -> None:
+        self._versions[doc[3]] -= 1
+        if self._versions[doc[3]] <= 0:
+            del self._versions[doc[3]]
+        self._apply(doc[0], doc[1], doc[2], sign=-1)
+
+    def ingest(self, texts: Iterable[FeedbackText]) -> Dict[str, int]:
+        ingested = updated = skipped = 0
+        changed: List[Tuple[str, str, Any]] = []
+        lexicon = lexicons.current
+        for t in texts:
+            # extração fora do lock (usa o cache por texto)
+            doc = (t.week, t.categoryId, extract_from_text(t.text, lexicon), lexicon.version)
+            with self._lock:
+                prev = self._docs.get(t.id)
+                if prev == doc:
+                    skipped += 1
+                    continue
+                if prev is not None:
+                    self._remove(prev)
+                    updated += 1
+                else:
+                    ingested += 1
+                self._add(t.id, doc)
+            changed.append(
+                (t.id, lexicon.version, {"week": t.week, "categoryId": t.categoryId, "keywords": doc[2]})
+            )
+        if result_store is not None:
+            result_store.put_many("keywords", changed)
+        return {"ingested": ingested, "updated": updated, "skipped": skipped}
+
+    def warm_start(self, store: ResultStore) -> int:
+        """Recarrega do armazém os documentos extraídos com a versão atual do léxico."""
+        loaded = 0
+        version = lexicons.current.version
+        with self._lock:
+            for fid, payload in store.iter_kind("keywords", version):
+                doc = (
+                    payload["week"],
+                    payload.get("categoryId"),
+                    tuple((kw, float(sc)) for kw, sc in payload.get("keywords", [])),
+                    version,
+                )
+                prev = self._docs.get(fid)
+                if prev is not None:
+                    self._remove(prev)
+                self._add(fid, doc)
+                loaded += 1
+        return loaded
+
+    def query(
+        self,
+        week_from: Optional[str],
+        week_to: Optional[str],
+        category_ids: Optional[List[str]],
+        top: int,
+        min_freq: int,
+        rank: str = "global",
+    ) -> KeywordResponse:
+        cats = set(category_ids) if category_ids is not None else None
+        with self._lock:
+            agg = [
+                ((week, cat, kw), dict(data))
+                for (week, cat), bucket in self._buckets.items()
+                if (week_from is None or week >= week_from)
+                and (week_to is None or week <= week_to)
+                and (cats is None or cat in cats)
+                for kw, data in bucket.items()
+            ]
+        return build_keyword_response(KeywordColumns.from_items(agg), top, min_freq, rank=rank)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            current = self._versions.get(lexicons.current.version, 0)
+            return {"documents": len(self._docs), "buckets": len(self._buckets), "stale": len(self._docs) - current}
+
+
+keyword_rollups = KeywordRollups()
 
 
 def describe_trend(series: List[SeriesPoint]) -> str:
@@ -815,18 +2581,20 @@ def format_answer(summary: str, insights: List[str], actions: List[str], intent:
     return "\n".join(lines).strip()
 
 
-def build_answer(req: AssistantRequest) -> AssistantResponse:
+def build_answer(req: AssistantRequest, session: Optional["AssistantSession"] = None) -> AssistantResponse:
     question = req.question or ""
-    ctx = req.context
-    intent = infer_intent(question)
-    focus = detect_focus(question)
-
-    trend = describe_trend(ctx.series)
-    vol_spike = pick_volume_spikes(ctx.volume)
-    neg_kw_str = summarize_keywords(ctx.words_neg, "Palavras negativas")
-    pos_kw_str = summarize_keywords(ctx.words_pos, "Palavras positivas")
-    neg_kw_top = top_keyword(ctx.words_neg)
-    main_topic = top_topic(ctx.topics)
+    session = session or AssistantSession(req.context)
+    ctx = session.ctx
+    nq = prepare(question)
+    intent = infer_intent(nq)
+    focus = detect_focus(nq)
+
+    trend = session.trend
+    vol_spike = session.vol_spike
+    neg_kw_str = session.neg_kw_str
+    pos_kw_str = session.pos_kw_str
+    neg_kw_top = session.neg_kw_top
+    main_topic = session.main_topic
     worst_qs = ctx.worst_questions[:3] if ctx.worst_questions else []
     nps = ctx.kpis.get("nps")
     total_fb = ctx.kpis.get("totalFeedbacks")
@@ -950,57 +2718,210 @@ def build_answer(req: AssistantRequest) -> AssistantResponse:
     )
 
 
-def call_gemini_chat(req: AssistantRequest) -> Optional[AssistantResponse]:
-    if not GEMINI_KEY:
-        print("[ai] Gemini não configurada (GEMINI_API_KEY ausente).")
-        return None
-    question = req.question or ""
-    intent = infer_intent(question)
-    ctx = req.context
-    if intent == "saudacao":
-        return build_greeting_reply(ctx, question)
+CONTEXT_SECTIONS = ("series", "volume", "topics", "words_neg", "words_pos", "worst_questions")
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
+# Ordem em que as seções disputam o orçamento, por intenção (a 1ª leva vantagem quando o espaço acaba).
+CONTEXT_PRIORITY = {
+    "resumo": ("series", "topics", "volume", "words_neg", "worst_questions", "words_pos"),
+    "nps": ("series", "topics", "worst_questions", "volume", "words_neg", "words_pos"),
+    "keywords": ("words_neg", "words_pos", "topics", "series", "worst_questions", "volume"),
+    "topics": ("topics", "worst_questions", "words_neg", "series", "volume", "words_pos"),
+    "actions": ("topics", "worst_questions", "words_neg", "series", "volume", "words_pos"),
+    "generic": ("series", "topics", "words_neg", "volume", "worst_questions", "words_pos"),
+}
 
-    def compact_series(series: List[SeriesPoint]) -> List[Dict[str, Optional[float]]]:
-        return [{"bucket": s.bucket, "avg": s.avg, "count": s.count} for s in (series or [])[-12:]]
 
-    topics = [
-        {"topic": t.topic, "neg": t.neg, "neu": t.neu, "pos": t.pos, "pneg": t.pneg}
-        for t in (ctx.topics or [])[:5]
-    ]
-    words_neg = [{"keyword": w.keyword, "total": w.total, "week": w.week} for w in (ctx.words_neg or [])[:8]]
-    words_pos = [{"keyword": w.keyword, "total": w.total, "week": w.week} for w in (ctx.words_pos or [])[:6]]
-    worst_q = [
-        {"question": w.question, "avg": w.avg, "total": w.total}
-        for w in (ctx.worst_questions or [])[:3]
-    ]
+# Itens por rodada para cada posição da ordem de prioridade.
+CONTEXT_WEIGHTS = (3, 2, 2, 1, 1, 1)
+
 
-    data_blob = {
-        "intent": intent.upper(),
-        "question": question,
-        "kpis": ctx.kpis,
-        "series": compact_series(ctx.series),
-        "volume": compact_series(ctx.volume),
-        "topics": topics,
-        "words_neg": words_neg,
-        "words_pos": words_pos,
-        "worst_questions": worst_q,
+def rank_assistant_context(ctx: AssistantContext) -> Dict[str, List[Tuple[int, Dict[str, Any]]]]:
+    """Itens de cada seção do contexto do Gemini, do mais informativo para o menos: (posição original, item).
+
+    Séries: pontas e maiores variações primeiro; volume: picos; tópicos: mais negativos; palavras: mais citadas;
+    perguntas: menores médias.
+    """
+
+    def point(s: SeriesPoint) -> Dict[str, Any]:
+        return {"bucket": s.bucket, "avg": s.avg, "count": s.count}
+
+    def series_rank(series: List[SeriesPoint]) -> List[Tuple[int, Dict[str, Any]]]:
+        last = len(series) - 1
+        prev: Optional[float] = None
+        change: List[float] = []
+        for i, s in enumerate(series):
+            if i in (0, last):
+                change.append(float("inf"))
+            else:
+                change.append(abs(s.avg - prev) if s.avg is not None and prev is not None else 0.0)
+            if s.avg is not None:
+                prev = s.avg
+        order = sorted(range(len(series)), key=lambda i: (-change[i], -i))
+        return [(i, point(series[i])) for i in order]
+
+    def volume_rank(volume: List[SeriesPoint]) -> List[Tuple[int, Dict[str, Any]]]:
+        order = sorted(range(len(volume)), key=lambda i: (-(volume[i].total or 0), -i))
+        return [(i, {"bucket": volume[i].bucket, "total": volume[i].total}) for i in order]
+
+    def words_rank(items: List[HeatItem]) -> List[Tuple[int, Dict[str, Any]]]:
+        order = sorted(range(len(items)), key=lambda i: -items[i].total)
+        return [(i, {"keyword": items[i].keyword, "total": items[i].total, "week": items[i].week}) for i in order]
+
+    topics = sorted(enumerate(ctx.topics or []), key=lambda it: (-it[1].neg, -it[1].pneg))
+    worst = sorted(enumerate(ctx.worst_questions or []), key=lambda it: (it[1].avg, -it[1].total))
+    return {
+        "series": series_rank(ctx.series or []),
+        "volume": volume_rank(ctx.volume or []),
+        "topics": [
+            (i, {"topic": t.topic, "neg": t.neg, "neu": t.neu, "pos": t.pos, "pneg": t.pneg}) for i, t in topics
+        ],
+        "words_neg": words_rank(ctx.words_neg or []),
+        "words_pos": words_rank(ctx.words_pos or []),
+        "worst_questions": [(i, {"question": w.question, "avg": w.avg, "total": w.total}) for i, w in worst],
     }
 
-    intent_hint = {
-        "resumo": "Foque em panorama geral (tendência, NPS se existir, volume, tópicos críticos).",
-        "nps": "Foque em NPS, evolução e o que puxa para cima/baixo.",
-        "keywords": "Foque em palavras-chave positivas/negativas mais frequentes e o que elas sugerem.",
-        "topics": "Foque em categorias/tópicos/perguntas com mais negativo e cite percentuais/médias.",
-        "actions": "Foque em recomendações práticas ligadas aos dados enviados: para cada tópico/pergunta/palavra negativa, proponha ações com o que fazer, onde, prazo sugerido e indicador de sucesso.",
-        "generic": "Seja conciso e peça foco se faltarem dados.",
-    }.get(intent, "Seja conciso e peça foco se faltarem dados.")
 
-    prompt = (
+def pack_assistant_context(
+    kpis: Dict[str, float], ranked: Dict[str, List[Tuple[int, Dict[str, Any]]]], intent: str, budget: int
+) -> Dict[str, Any]:
+    """Recorte do contexto para o Gemini dentro do orçamento de tokens (estimado como em estimate_tokens).
+
+    As seções entram em rodadas, na ordem de prioridade da intenção e com mais itens por rodada para as
+    primeiras (CONTEXT_WEIGHTS); uma seção cujo próximo item não cabe para de crescer. Séries e volume voltam
+    à ordem cronológica; `omitted` conta o que ficou de fora.
+    """
+    skeleton: Dict[str, Any] = {"kpis": kpis, **{sec: [] for sec in CONTEXT_SECTIONS}}
+    used = len(json.dumps(skeleton, ensure_ascii=False))
+    # reserva espaço para o `omitted` no pior caso
+    limit = max(0, budget - 1) * 4 - len(json.dumps({"omitted": {sec: 99999 for sec in CONTEXT_SECTIONS}}))
+    picked: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {sec: [] for sec in CONTEXT_SECTIONS}
+    order = CONTEXT_PRIORITY.get(intent, CONTEXT_PRIORITY["generic"])
+    cursor = {sec: 0 for sec in CONTEXT_SECTIONS}
+    open_secs = [sec for sec in order if ranked[sec]]
+    while open_secs:
+        for sec, weight in zip(list(open_secs), CONTEXT_WEIGHTS):
+            items = ranked[sec]
+            for _ in range(weight):
+                if cursor[sec] >= len(items):
+                    open_secs.remove(sec)
+                    break
+                # item + separador ", "
+                cost = len(json.dumps(items[cursor[sec]][1], ensure_ascii=False)) + 2
+                if used + cost > limit:
+                    open_secs.remove(sec)
+                    break
+                picked[sec].append(items[cursor[sec]])
+                cursor[sec] += 1
+                used += cost
+    blob: Dict[str, Any] = {"kpis": kpis}
+    omitted: Dict[str, int] = {}
+    for sec in CONTEXT_SECTIONS:
+        items = sorted(picked[sec], key=lambda it: it[0]) if sec in ("series", "volume") else picked[sec]
+        blob[sec] = [item for _, item in items]
+        if len(items) < len(ranked[sec]):
+            omitted[sec] = len(ranked[sec]) - len(items)
+    if omitted:
+        blob["omitted"] = omitted
+    return blob
+
+
+# Só artigos saem da chave: quantificadores e negações ("mais", "menos", "sem", "muito") mudam a pergunta.
+QUESTION_KEY_STOPWORDS = frozenset({"o", "a", "os", "as", "um", "uma", "uns", "umas"})
+
+
+def normalize_question(question: Union[str, NormalizedText]) -> str:
+    """Forma canônica da pergunta: sem caixa, acento, pontuação e artigos, mantendo a ordem das palavras."""
+    return " ".join(tok for tok in prepare(question).words if tok not in QUESTION_KEY_STOPWORDS)
+
+
+def context_fingerprint(context_blob: Dict[str, Any]) -> str:
+    payload = json.dumps(context_blob, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def assistant_cache_key(intent: str, question: Union[str, NormalizedText], fingerprint: str) -> Tuple[str, str, str]:
+    return intent, normalize_question(question), fingerprint
+
+
+# Respostas do Gemini por (intenção, pergunta normalizada, impressão digital do contexto).
+assistant_cache = LRUCache(ASSISTANT_CACHE_SIZE, ttl=ASSISTANT_CACHE_TTL_SECONDS)
+
+
+class AssistantSession:
+    """Contexto do assistente com os derivados já calculados (tendência, picos, tópico, keywords, recorte do Gemini)."""
+
+    def __init__(self, ctx: AssistantContext):
+        self.ctx = ctx
+        self.trend = describe_trend(ctx.series)
+        self.vol_spike = pick_volume_spikes(ctx.volume)
+        self.neg_kw_str = summarize_keywords(ctx.words_neg, "Palavras negativas")
+        self.pos_kw_str = summarize_keywords(ctx.words_pos, "Palavras positivas")
+        self.neg_kw_top = top_keyword(ctx.words_neg)
+        self.main_topic = top_topic(ctx.topics)
+        self.ranked = rank_assistant_context(ctx)
+        self.fingerprint = context_fingerprint(
+            {"kpis": ctx.kpis, **{sec: [item for _, item in items] for sec, items in self.ranked.items()}}
+        )
+        self._packed: Dict[str, Dict[str, Any]] = {}
+
+    def context_blob(self, intent: str) -> Dict[str, Any]:
+        """Recorte do contexto para a intenção, dentro de ASSISTANT_PROMPT_TOKEN_BUDGET (calculado uma vez)."""
+        blob = self._packed.get(intent)
+        if blob is None:
+            blob = self._packed[intent] = pack_assistant_context(
+                self.ctx.kpis, self.ranked, intent, ASSISTANT_PROMPT_TOKEN_BUDGET
+            )
+        return blob
+
+
+# Sessões registradas pelo backend: um contexto por conjunto de filtros, reaproveitado entre mensagens.
+assistant_sessions = LRUCache(ASSISTANT_SESSION_SIZE, ttl=ASSISTANT_SESSION_TTL_SECONDS)
+
+
+def register_assistant_session(
+    req: AssistantSessionRequest, timings: Optional[Dict[str, float]] = None
+) -> Tuple[str, AssistantSession]:
+    """Extrai as keywords dos textos (uma vez por sessão), calcula os derivados e guarda a sessão."""
+    ctx = req.context
+    if req.texts:
+        kw = aggregate_keywords(KeywordRequest(texts=req.texts, top=req.top), timings)
+        ctx.words_neg, ctx.words_pos = kw.neg, kw.pos
+    session_id = req.sessionId or secrets.token_urlsafe(16)
+    session = AssistantSession(ctx)
+    assistant_sessions.put(session_id, session)
+    return session_id, session
+
+
+def resolve_assistant_session(req: AssistantRequest) -> AssistantSession:
+    """Sessão informada em `sessionId` (404 se expirou) ou uma sessão avulsa com o `context` do request."""
+    if not req.sessionId:
+        return AssistantSession(req.context)
+    session = assistant_sessions.get(req.sessionId)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sessão do assistente não encontrada ou expirada.")
+    return session
+
+
+CHAT_GENERATION_CONFIG = {"temperature": 0.35, "top_p": 0.9}
+
+
+CHAT_INTENT_HINTS = {
+    "resumo": "Foque em panorama geral (tendência, NPS se existir, volume, tópicos críticos).",
+    "nps": "Foque em NPS, evolução e o que puxa para cima/baixo.",
+    "keywords": "Foque em palavras-chave positivas/negativas mais frequentes e o que elas sugerem.",
+    "topics": "Foque em categorias/tópicos/perguntas com mais negativo e cite percentuais/médias.",
+    "actions": "Foque em recomendações práticas ligadas aos dados enviados: para cada tópico/pergunta/palavra negativa, proponha ações com o que fazer, onde, prazo sugerido e indicador de sucesso.",
+    "generic": "Seja conciso e peça foco se faltarem dados.",
+}
+
+
+def chat_preamble(intent: str) -> str:
+    """Instruções fixas do chat para uma intenção (vão como system_instruction, antes dos dados)."""
+    return (
+        "Siga rigorosamente as regras e o formato solicitado.\n"
         "Você é um assistente de dados do TalkClass. Responda em português do Brasil, tom de consultor educacional. "
         "Use SOMENTE os dados do JSON fornecido (não invente nenhum número). "
-        f"Intenção inferida: {intent.upper()}. {intent_hint} "
+        f"Intenção inferida: {intent.upper()}. {CHAT_INTENT_HINTS[intent]} "
         "Retorne APENAS um JSON válido com este formato:\n"
         '{"summary": "frase curta (1-2) contextualizada com números", '
         '"insights": ["bullet 1", "bullet 2", "..."], '
@@ -1012,20 +2933,80 @@ def call_gemini_chat(req: AssistantRequest) -> Optional[AssistantResponse]:
         "- Para intent ACTIONS: gere ações específicas por tópico/pergunta/palavra negativa. Cada ação deve incluir o que fazer, onde (área ou tópico), prazo sugerido e indicador de sucesso (ex.: subir média de X para Y, reduzir negativos em %). Evite frases genéricas como 'revisar' ou 'melhorar' sem detalhar.\n"
         "- Para intent GENÉRICO sem dados fortes, peça que o usuário escolha foco (NPS, tópicos, palavras) em vez de inventar métricas.\n"
         "- Adapte o tom e o conteúdo ao intent: RESUMO/NPS/TOPICS/KEYWORDS/ACTIONS.\n"
-        "- Nunca adicione texto fora do JSON. Não crie campos extras.\n"
-        f"Dados de contexto (JSON): {json.dumps(data_blob, ensure_ascii=False)}"
+        "- Os dados vêm resumidos: listas trazem primeiro os itens mais relevantes e `omitted` conta os que ficaram de fora.\n"
+        "- Nunca adicione texto fora do JSON. Não crie campos extras."
     )
+
+
+# Montadas uma vez: o prefixo idêntico entre chamadas é o que o cache implícito do Gemini reaproveita.
+CHAT_PREAMBLES = {intent: chat_preamble(intent) for intent in CHAT_INTENT_HINTS}
+
+
+def build_chat_prompt(intent: str, question: str, session: AssistantSession) -> Tuple[str, List[Dict[str, Any]]]:
+    """(system_instruction, contents) do chat: instruções fixas da intenção + recorte do contexto em JSON."""
+    intent = intent if intent in CHAT_PREAMBLES else "generic"
+    data_blob = {"intent": intent.upper(), "question": question, **session.context_blob(intent)}
+    contents = [{"role": "user", "parts": [{"text": f"Dados de contexto (JSON): {json.dumps(data_blob, ensure_ascii=False)}"}]}]
+    return CHAT_PREAMBLES[intent], contents
+
+
+def chat_response_from_json(data: Dict[str, Any], intent: str, filters: Dict[str, str]) -> AssistantResponse:
+    summary = str(data.get("summary", "")).strip()
+    insights = dedupe_keep_order([str(i).strip() for i in (data.get("insights") or []) if str(i).strip()])
+    actions_raw = [a for a in (data.get("actions") or []) if str(a).strip()]
+    actions = dedupe_keep_order([format_action_item(a) for a in actions_raw])
+    formatted = format_answer(summary, insights[:5], actions[:4], intent)
+    return AssistantResponse(
+        answer=formatted + "\n\n[Origem: Gemini]",
+        highlights=[],
+        suggestions=[],
+        filters=filters,
+    )
+
+
+def cached_chat_response(cache_key: Tuple[str, str, str], filters: Dict[str, str]) -> Optional[AssistantResponse]:
+    cached = assistant_cache.get(cache_key)
+    if cached is None:
+        return None
+    return AssistantResponse(
+        answer=cached.answer,
+        highlights=list(cached.highlights),
+        suggestions=list(cached.suggestions),
+        filters=filters,
+    )
+
+
+async def call_gemini_chat(
+    req: AssistantRequest, timeout: Optional[float] = None, session: Optional[AssistantSession] = None
+) -> Optional[AssistantResponse]:
+    if not GEMINI_KEY:
+        print("[ai] Gemini não configurada (GEMINI_API_KEY ausente).")
+        return None
+    question = req.question or ""
+    nq = prepare(question)
+    intent = infer_intent(nq)
+    session = session or AssistantSession(req.context)
+    ctx = session.ctx
+    if intent == "saudacao":
+        return build_greeting_reply(ctx, question)
+
+    cache_key = assistant_cache_key(intent, nq, session.fingerprint)
+    cached = cached_chat_response(cache_key, ctx.filters)
+    if cached is not None:
+        return cached
+
     try:
-        resp = model.generate_content(
-            [
-                # Gemini aceita apenas 'user'/'model'; consolidamos instruções no papel de usuário.
-                {"role": "user", "parts": [{"text": "Siga rigorosamente as regras e o formato solicitado."}]},
-                {"role": "user", "parts": [{"text": prompt}]},
-            ],
-            generation_config={"temperature": 0.35, "top_p": 0.9},
+        system_instruction, contents = build_chat_prompt(intent, question, session)
+        resp = await gemini.generate(
+            GEMINI_CHAT_MODEL,
+            contents,
+            generation_config=CHAT_GENERATION_CONFIG,
+            timeout=timeout,
+            system_instruction=system_instruction,
         )
         if not resp or not resp.candidates:
             print("[ai] Gemini sem candidatos; fallback ativado.")
+            GEMINI_CALLS.inc("chat", "no_candidates")
             return None
         text = ""
         data = None
@@ -1041,41 +3022,700 @@ def call_gemini_chat(req: AssistantRequest) -> Optional[AssistantResponse]:
                 break
         if data is None:
             print("[ai] Gemini retornou JSON inválido; fallback local acionado.")
+            GEMINI_CALLS.inc("chat", "invalid_json")
             return None
-        summary = str(data.get("summary", "")).strip()
-        insights = dedupe_keep_order([str(i).strip() for i in (data.get("insights") or []) if str(i).strip()])
-        actions_raw = [a for a in (data.get("actions") or []) if str(a).strip()]
-        actions = dedupe_keep_order([format_action_item(a) for a in actions_raw])
-
-        formatted = format_answer(summary, insights[:5], actions[:4], intent)
-        answer = formatted + "\n\n[Origem: Gemini]"
-
         print("[ai] Resposta Gemini gerada.")
-        return AssistantResponse(
-            answer=answer,
-            highlights=[],
-            suggestions=[],
-            filters=req.context.filters,
-        )
+        GEMINI_CALLS.inc("chat", "ok")
+        result = chat_response_from_json(data, intent, ctx.filters)
+        assistant_cache.put(cache_key, result)
+        return result
+    except CircuitOpenError:
+        GEMINI_CALLS.inc("chat", "circuit_open")
+        return None
+    except asyncio.TimeoutError:
+        print("[ai] Gemini excedeu o prazo; fallback local acionado.")
+        GEMINI_CALLS.inc("chat", "timeout")
+        return None
     except Exception as ex:
         print(f"[ai] Erro ao chamar Gemini: {ex!r}")
+        GEMINI_CALLS.inc("chat", "exception")
         return None
 
 
+class ChatJsonStream:
+    """Parser incremental do JSON do chat ({summary, insights: [...], actions: [...]}).
+
+    Recebe os trechos do stream do Gemini e devolve os pedaços de texto de cada campo assim que chegam,
+    sem esperar o JSON fechar. Ignora o que vier antes do primeiro "{" (ex.: cercas ```json).
+    """
+
+    LIST_FIELDS = ("insights", "actions")
+
+    def __init__(self):
+        self.stack: List[str] = []
+        self.expect_key = False
+        self.key: Optional[str] = None
+        self.index = -1
+        self.in_string = False
+        self.is_key = False
+        self.target: Optional[Tuple[str, Optional[int]]] = None
+        self.key_chars: List[str] = []
+        self.escape = ""
+        self.high_surrogate: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for ch in chunk:
+            if self.in_string:
+                out = self._string_char(ch)
+                if out and self.target is not None:
+                    field, index = self.target
+                    if events and events[-1]["field"] == field and events[-1]["index"] == index:
+                        events[-1]["delta"] += out
+                    else:
+                        events.append({"field": field, "index": index, "delta": out})
+            elif not self.stack:
+                if ch == "{":
+                    self.stack.append(ch)
+                    self.expect_key = True
+            elif ch == '"':
+                self._open_string()
+            elif ch in "{[":
+                self.stack.append(ch)
+                self.expect_key = ch == "{"
+            elif ch in "}]":
+                self.stack.pop()
+                self.expect_key = False
+            elif ch == ":":
+                self.expect_key = False
+            elif ch == ",":
+                self.expect_key = self.stack[-1] == "{"
+        return events
+
+    def _open_string(self) -> None:
+        self.in_string = True
+        self.is_key = self.stack[-1] == "{" and self.expect_key
+        self.key_chars = []
+        self.target = None
+        depth = len(self.stack)
+        if self.is_key:
+            return
+        if depth == 1 and self.key == "summary":
+            self.target = ("summary", None)
+        elif depth == 2 and self.stack[-1] == "[" and self.key in self.LIST_FIELDS:
+            self.index += 1
+            self.target = (self.key, self.index)
+
+    def _string_char(self, ch: str) -> str:
+        if self.escape:
+            self.escape += ch
+            if self.escape[1] != "u":
+                self.escape = ""
+                return self._lone_surrogate() + self._emit(
+                    {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}.get(ch, ch)
+                )
+            if len(self.escape) < 6:
+                return ""
+            try:
+                cp = int(self.escape[2:], 16)
+            except ValueError:
+                cp = 0xFFFD
+            self.escape = ""
+            if 0xDC00 <= cp < 0xE000 and self.high_surrogate is not None:
+                cp = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (cp - 0xDC00)
+                self.high_surrogate = None
+                return self._emit(chr(cp))
+            lone = self._lone_surrogate()
+            if 0xD800 <= cp < 0xDC00:
+                self.high_surrogate = cp
+                return lone
+            return lone + self._emit(chr(cp) if not 0xD800 <= cp < 0xE000 else "\ufffd")
+        if ch == "\\":
+            self.escape = ch
+            return ""
+        lone = self._lone_surrogate()
+        if ch == '"':
+            self.in_string = False
+            if self.is_key and len(self.stack) == 1:
+                self.key = "".join(self.key_chars)
+                self.index = -1
+            return lone
+        return lone + self._emit(ch)
+
+    def _lone_surrogate(self) -> str:
+        """Surrogate alto sem o par logo em seguida vira U+FFFD (e não casa com um surrogate baixo posterior)."""
+        if self.high_surrogate is None:
+            return ""
+        self.high_surrogate = None
+        return self._emit("\ufffd")
+
+    def _emit(self, text: str) -> str:
+        if self.is_key:
+            self.key_chars.append(text)
+            return ""
+        return text
+
+
+async def stream_gemini_chat(
+    req: AssistantRequest, session: AssistantSession, timeout: Optional[float] = None
+) -> AsyncIterator[Union[Dict[str, Any], AssistantResponse]]:
+    """Versão em stream do call_gemini_chat: devolve deltas dos campos e, no fim, a AssistantResponse.
+
+    Sem Gemini, saudação ou em caso de falha termina sem resposta final (o rascunho local vale).
+    """
+    if not GEMINI_KEY:
+        return
+    question = req.question or ""
+    nq = prepare(question)
+    intent = infer_intent(nq)
+    if intent == "saudacao":
+        return
+    filters = session.ctx.filters
+    cache_key = assistant_cache_key(intent, nq, session.fingerprint)
+    cached = cached_chat_response(cache_key, filters)
+    if cached is not None:
+        yield cached
+        return
+
+    parser = ChatJsonStream()
+    parts: List[str] = []
+    system_instruction, contents = build_chat_prompt(intent, question, session)
+    try:
+        async for text in gemini.stream(
+            GEMINI_CHAT_MODEL,
+            contents,
+            generation_config=CHAT_GENERATION_CONFIG,
+            timeout=timeout,
+            system_instruction=system_instruction,
+        ):
+            parts.append(text)
+            for event in parser.feed(text):
+                yield event
+    except CircuitOpenError:
+        GEMINI_CALLS.inc("chat_stream", "circuit_open")
+        return
+    except asyncio.TimeoutError:
+        print("[ai] Gemini (stream) excedeu o prazo; rascunho local mantido.")
+        GEMINI_CALLS.inc("chat_stream", "timeout")
+        return
+    except Exception as ex:
+        print(f"[ai] Erro no stream do Gemini: {ex!r}")
+        GEMINI_CALLS.inc("chat_stream", "exception")
+        return
+    data = parse_json_tolerant("".join(parts))
+    if data is None:
+        print("[ai] Gemini (stream) retornou JSON inválido; rascunho local mantido.")
+        GEMINI_CALLS.inc("chat_stream", "invalid_json")
+        return
+    GEMINI_CALLS.inc("chat_stream", "ok")
+    result = chat_response_from_json(data, intent, filters)
+    assistant_cache.put(cache_key, result)
+    yield result
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def assistant_events(req: AssistantRequest, session: AssistantSession) -> AsyncIterator[bytes]:
+    """draft (fallback local, imediato) -> delta* (texto do Gemini por campo) -> final (resposta completa)."""
+    draft = build_answer(req, session)
+    yield sse_event("draft", draft)
+    final: Optional[AssistantResponse] = None
+    async for item in stream_gemini_chat(req, session):
+        if isinstance(item, AssistantResponse):
+            final = item
+        else:
+            yield sse_event("delta", item)
+    yield sse_event("final", final or draft)
+
+
+# Chamadas ao Gemini que passaram do SLO e seguem rodando (referência forte até terminarem).
+late_answers: Set[asyncio.Task] = set()
+
+
+def _record_late_answer(task: asyncio.Task) -> None:
+    late_answers.discard(task)
+    ok = not task.cancelled() and task.exception() is None and task.result() is not None
+    ASSISTANT_ANSWERS.inc("late_ok" if ok else "late_fail")
+
+
+async def answer_within_slo(req: AssistantRequest, session: AssistantSession, slo: float) -> AssistantResponse:
+    """Dispara Gemini e fallback local juntos; devolve o Gemini se chegar dentro do SLO, senão a resposta local."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + slo
+    llm = asyncio.create_task(call_gemini_chat(req, session=session))
+    try:
+        local = await asyncio.to_thread(build_answer, req, session)
+        done, _ = await asyncio.wait({llm}, timeout=max(0.0, deadline - loop.time()))
+    except BaseException:
+        # fallback com erro ou request cancelado: a chamada ao Gemini não fica órfã no loop
+        llm.cancel()
+        raise
+    if not done:
+        # não cancela: a resposta tardia ainda entra no assistant_cache para a próxima pergunta igual
+        late_answers.add(llm)
+        llm.add_done_callback(_record_late_answer)
+        ASSISTANT_ANSWERS.inc("local_slo")
+        return local
+    if llm.result() is not None:
+        ASSISTANT_ANSWERS.inc("llm")
+        return llm.result()
+    ASSISTANT_ANSWERS.inc("local_fallback")
+    return local
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token em português)."""
+    return len(text or "") // 4 + 1
+
+
+def local_enrichment(items: List[SentimentText]) -> List[FeedbackAiResult]:
+    """Enriquecimento local (sentimento em lote + keywords do léxico) quando o Gemini não responde."""
+    scores = compute_sentiment_batch([it.text for it in items]).tolist()
+    out: List[FeedbackAiResult] = []
+    for it, sc in zip(items, scores):
+        kws = sorted(extract_from_text(it.text), key=lambda kv: -abs(kv[1]))
+        out.append(
+            FeedbackAiResult(
+                id=it.id,
+                sentiment=sentiment_label(sc),
+                score01=(sc + 1.0) / 2.0,
+                keywords=[kw for kw, _ in kws][:4],
+            )
+        )
+    return out
+
+
+def enrichment_local_version() -> str:
+    return f"local:{lexicons.current.version}"
+
+
+class EnrichmentCoalescer:
+    """Fila de enriquecimento: agrupa feedbacks em micro-lotes limitados por tokens/itens/tempo para o Gemini."""
+
+    def __init__(
+        self,
+        results: LRUCache,
+        token_budget: int,
+        max_items: int,
+        max_wait: float,
+        max_concurrency: int,
+        calls_per_minute: float,
+    ):
+        self.results = results
+        self.token_budget = token_budget
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait
+        self.max_concurrency = max(1, max_concurrency)
+        self.interval = 60.0 / calls_per_minute if calls_per_minute > 0 else 0.0
+        self.batches = 0
+        self.pending: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._carry: Optional[SentimentText] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._next_call = 0.0
+
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._runner, *self._inflight] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runner = None
+        self._inflight.clear()
+        self.pending.clear()
+        self._carry = None
+
+    def submit(self, items: Iterable[SentimentText]) -> int:
+        """Enfileira itens novos (ou com texto alterado); ids já pendentes com o mesmo texto são ignorados."""
+        self.start()
+        queued = 0
+        for it in items:
+            if self.pending.get(it.id) == it.text:
+                continue
+            self.pending[it.id] = it.text
+            self._queue.put_nowait(it)
+            queued += 1
+        return queued
+
+    async def _next_batch(self) -> List[SentimentText]:
+        loop = asyncio.get_running_loop()
+        first = self._carry or await self._queue.get()
+        self._carry = None
+        batch = [first]
+        tokens = estimate_tokens(first.text)
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_items:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            cost = estimate_tokens(item.text)
+            if tokens + cost > self.token_budget:
+                # não cabe no orçamento: abre o próximo lote
+                self._carry = item
+                break
+            batch.append(item)
+            tokens += cost
+        return batch
+
+    @staticmethod
+    def _calls_gemini() -> bool:
+        """Sem chave, ou com o circuito aberto aguardando nova tentativa, o lote vai direto para o fallback local."""
+        breaker = gemini.breaker
+        return bool(GEMINI_KEY) and not (breaker.state == "open" and time.monotonic() < breaker.retry_at)
+
+    async def _throttle(self) -> None:
+        """Espaça o início das chamadas para respeitar o limite de chamadas por minuto."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start_at = max(now, self._next_call)
+        self._next_call = start_at + self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            await self._slots.acquire()
+            if self._calls_gemini():
+                await self._throttle()
+            task = asyncio.create_task(self._flush(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, batch: List[SentimentText]) -> None:
+        try:
+            self.batches += 1
+            by_id = {it.id: it for it in batch}
+            enriched = {r.id: r for r in await call_gemini_batch(batch) if r.id in by_id}
+            from_gemini = set(enriched)
+            missing = [it for it in batch if it.id not in enriched]
+            if missing:
+                enriched.update((r.id, r) for r in local_enrichment(missing))
+            for it in batch:
+                self.results.put(it.id, enriched[it.id])
+                if self.pending.get(it.id) == it.text:
+                    del self.pending[it.id]
+            if result_store is not None:
+                local_version = enrichment_local_version()
+                result_store.put_many(
+                    "enrich",
+                    [
+                        (fid, GEMINI_BATCH_MODEL if fid in from_gemini else local_version, jsonable_encoder(res))
+                        for fid, res in enriched.items()
+                    ],
+                )
+        except Exception as ex:
+            print(f"[ai] Falha ao processar lote de enriquecimento: {ex!r}")
+            for it in batch:
+                self.pending.pop(it.id, None)
+        finally:
+            self._slots.release()
+
+    def lookup(self, ids: List[str]) -> Tuple[List[FeedbackAiResult], List[str], List[str]]:
+        cached = {fid: self.results.get(fid) for fid in dict.fromkeys(ids)}
+        # o que não está em memória é buscado de uma vez no armazém local
+        absent = [fid for fid, res in cached.items() if res is None and fid not in self.pending]
+        if absent and result_store is not None:
+            versions = {GEMINI_BATCH_MODEL, enrichment_local_version()}
+            for fid, payload in result_store.get_many("enrich", absent, versions).items():
+                cached[fid] = FeedbackAiResult(**payload)
+                self.results.put(fid, cached[fid])
+
+        found: List[FeedbackAiResult] = []
+        pending: List[str] = []
+        missing: List[str] = []
+        for fid, res in cached.items():
+            if res is not None:
+                found.append(res)
+            elif fid in self.pending:
+                pending.append(fid)
+            else:
+                missing.append(fid)
+        return found, pending, missing
+
+
+enrichment = EnrichmentCoalescer(
+    LRUCache(ENRICH_RESULTS_SIZE),
+    token_budget=ENRICH_BATCH_TOKEN_BUDGET,
+    max_items=ENRICH_BATCH_MAX_ITEMS,
+    max_wait=ENRICH_FLUSH_SECONDS,
+    max_concurrency=ENRICH_MAX_CONCURRENT_BATCHES,
+    calls_per_minute=ENRICH_CALLS_PER_MINUTE,
+)
+
+
+def warmup() -> None:
+    """Roda em thread no startup: carrega o SDK do Gemini e exercita autômato e sentimento antes do 1º request."""
+    steps = [
+        ("warmup_lexicon", lambda: extract_from_normalized("warmup")),
+        ("warmup_sentiment", lambda: compute_sentiment("muito bom")),
+    ]
+    if GEMINI_KEY:
+        steps.append(
+            (
+                "warmup_gemini",
+                lambda: [gemini.model(GEMINI_BATCH_MODEL)]
+                + [gemini.model(GEMINI_CHAT_MODEL, preamble) for preamble in CHAT_PREAMBLES.values()],
+            )
+        )
+    for name, step in steps:
+        try:
+            with startup.phase(name):
+                step()
+        except Exception as ex:
+            # fallback local continua disponível; registra e segue
+            startup.errors.append(f"{name}: {ex!r}")
+            print(f"[ai] Falha no aquecimento ({name}): {ex!r}")
+    startup.set_ready()
+
+
 # ---------- ROUTES ----------
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    """Liveness: o processo responde. `ready` indica se o aquecimento terminou."""
+    return {
+        "status": "ok",
+        "ready": startup.ready,
+        "startup": startup.summary(),
+        "gemini": {"configured": bool(GEMINI_KEY), "circuit": gemini.breaker.snapshot()},
+    }
+
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: 503 até o aquecimento terminar (para o balanceador não mandar tráfego antes)."""
+    if not startup.ready:
+        return JSONResponse({"status": "warming_up", "ready": False}, status_code=503)
+    return {"status": "ok", "ready": True}
 
 
 @app.post("/keywords", response_model=KeywordResponse)
 def keywords(req: KeywordRequest):
-    return aggregate_keywords(req)
+    timings: Dict[str, float] = defaultdict(float)
+    result = aggregate_keywords(req, timings)
+    # serializa aqui (em vez de deixar para o FastAPI) para medir a etapa
+    start = time.perf_counter()
+    content = jsonable_encoder(result)
+    timings["serialize"] += time.perf_counter() - start
+    observe_keyword_stages("/keywords", len(req.texts), timings)
+    return JSONResponse(content)
+
+
+@app.post("/sentiment", response_model=SentimentResponse)
+def sentiment(req: SentimentRequest):
+    scores = cached_sentiment_scores([t.text for t in req.texts])
+    return SentimentResponse(
+        items=[
+            SentimentItem(id=t.id, sentiment=sentiment_label(sc), score=sc, score01=(sc + 1.0) / 2.0)
+            for t, sc in zip(req.texts, scores)
+        ]
+    )
+
+
+@app.post("/enrich", response_model=EnrichResponse)
+async def enrich(req: EnrichRequest):
+    queued = enrichment.submit(req.texts)
+    return EnrichResponse(queued=queued, pending=len(enrichment.pending))
+
+
+@app.post("/enrich/results", response_model=EnrichLookupResponse)
+def enrich_results(req: EnrichLookupRequest):
+    results, pending, missing = enrichment.lookup(req.ids)
+    return EnrichLookupResponse(results=results, pending=pending, missing=missing)
+
+
+@app.post("/keywords/matrix", response_model=KeywordMatrixResponse)
+def keywords_matrix(req: KeywordRequest):
+    """Mesma extração do /keywords pivotada em matriz; mantém as `top` keywords de maior total (>= min_freq)."""
+    cols = KeywordAggregator().consume(req.texts).columns()
+    weeks, totals, scores = cols.matrix()
+    per_kw = totals.sum(axis=0)
+    keep = np.flatnonzero(per_kw >= req.min_freq)
+    keep = keep[np.lexsort((label_ranks(cols.keywords)[keep], -per_kw[keep]))][: max(0, req.top)]
+    totals, scores = totals[:, keep], scores[:, keep]
+    avg = np.where(totals > 0, scores / np.maximum(totals, 1), np.nan)
+    return KeywordMatrixResponse(
+        weeks=weeks,
+        keywords=[cols.keywords[i] for i in keep],
+        total=totals.tolist(),
+        score=[[None if np.isnan(v) else v for v in row] for row in avg.tolist()],
+    )
+
+
+@app.post("/keywords/stream", response_model=KeywordResponse)
+async def keywords_stream(request: Request, top: int = 40, min_freq: int = 1, rank: KeywordRank = "global"):
+    """Variante de /keywords que lê `application/x-ndjson` (um FeedbackText por linha) em streaming."""
+    aggregator = KeywordAggregator()
+    # parse + extração rodam no threadpool; o event loop só recebe os bytes e despacha os lotes
+    async for lines in iter_ndjson_lines(request.stream()):
+        await run_in_threadpool(consume_ndjson_lines, aggregator, lines)
+    result = await run_in_threadpool(aggregator.response, top, min_freq, rank)
+    observe_keyword_stages("/keywords/stream", aggregator.texts, aggregator.timings)
+    return result
+
+
+@app.post("/keywords/ingest", response_model=KeywordIngestResponse)
+def keywords_ingest(req: KeywordIngestRequest):
+    counts = keyword_rollups.ingest(req.texts)
+    return KeywordIngestResponse(**counts, **keyword_rollups.stats())
+
+
+@app.post("/keywords/query", response_model=KeywordResponse)
+def keywords_query(req: KeywordQuery):
+    return keyword_rollups.query(req.weekFrom, req.weekTo, req.categoryIds, req.top, req.min_freq, req.rank)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@metrics.collector
+def cache_metrics() -> List[str]:
+    caches = {
+        "extraction": extraction_cache,
+        "sentiment": sentiment_cache,
+        "assistant": assistant_cache,
+        "assistant_session": assistant_sessions,
+        "enrichment": enrichment.results,
+    }
+    lines = [
+        "# HELP talkclass_ai_cache_hits_total Acertos por cache.",
+        "# TYPE talkclass_ai_cache_hits_total counter",
+    ]
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    stats["normalize"] = memo_stats()
+    lines += [f'talkclass_ai_cache_hits_total{{cache="{n}"}} {s["hits"]}' for n, s in stats.items()]
+    lines += ["# HELP talkclass_ai_cache_misses_total Falhas por cache.", "# TYPE talkclass_ai_cache_misses_total counter"]
+    lines += [f'talkclass_ai_cache_misses_total{{cache="{n}"}} {s["misses"]}' for n, s in stats.items()]
+    lines += ["# HELP talkclass_ai_cache_hit_ratio Taxa de acerto por cache.", "# TYPE talkclass_ai_cache_hit_ratio gauge"]
+    lines += [f'talkclass_ai_cache_hit_ratio{{cache="{n}"}} {s["hit_ratio"]}' for n, s in stats.items()]
+    lines += ["# HELP talkclass_ai_cache_entries Entradas por cache.", "# TYPE talkclass_ai_cache_entries gauge"]
+    lines += [f'talkclass_ai_cache_entries{{cache="{n}"}} {s["size"]}' for n, s in stats.items()]
+    return lines
+
+
+@metrics.collector
+def circuit_metrics() -> List[str]:
+    snap = gemini.breaker.snapshot()
+    lines = [
+        "# HELP talkclass_ai_gemini_circuit_state Estado do disjuntor do Gemini (1 no estado atual).",
+        "# TYPE talkclass_ai_gemini_circuit_state gauge",
+    ]
+    lines += [
+        f'talkclass_ai_gemini_circuit_state{{state="{state}"}} {int(snap["state"] == state)}'
+        for state in ("closed", "open", "half_open")
+    ]
+    lines += [
+        "# HELP talkclass_ai_gemini_circuit_trips_total Aberturas do disjuntor do Gemini.",
+        "# TYPE talkclass_ai_gemini_circuit_trips_total counter",
+        f"talkclass_ai_gemini_circuit_trips_total {snap['trips']}",
+    ]
+    return lines
+
+
+@app.get("/profiles/{name}")
+def profile_download(name: str, request: Request):
+    if not has_profile_token(request.headers.get("x-profile-token")):
+        raise HTTPException(status_code=404, detail="Not Found")
+    path = os.path.join(profile_dir(), os.path.basename(name))
+    if not name.endswith(".folded") or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    with open(path, encoding="utf-8") as fh:
+        return PlainTextResponse(fh.read())
+
+
+@app.get("/store")
+def store_stats():
+    if result_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_store.stats()}
+
+
+@app.get("/assistant/cache")
+def assistant_cache_stats():
+    return assistant_cache.stats()
+
+
+@app.get("/lexicon")
+def lexicon_info():
+    return {**lexicons.current.summary(), "loadedAt": lexicons.loaded_at, "rollups": keyword_rollups.stats()}
+
+
+@app.post("/lexicon/reload")
+async def lexicon_reload(request: Request):
+    """Recarrega o arquivo de léxico (corpo vazio) ou instala e grava o léxico enviado no corpo (JSON)."""
+    if not token_matches(request.headers.get("x-admin-token"), ADMIN_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+    body = await request.body()
+    try:
+        if body.strip():
+            lexicons.replace(json.loads(body))
+        else:
+            lexicons.reload()
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=f"Léxico inválido: {ex}")
+    except OSError as ex:
+        raise HTTPException(status_code=500, detail=f"Falha ao ler/gravar o léxico: {ex}")
+    return lexicon_info()
+
+
+@app.get("/keywords/cache")
+def keywords_cache():
+    return {"lexiconVersion": lexicons.current.version, **extraction_cache.stats()}
+
+
+@app.post("/assistant/context", response_model=AssistantSessionResponse)
+def assistant_context(req: AssistantSessionRequest):
+    """Registra (ou renova) o contexto de um conjunto de filtros; as mensagens seguintes mandam só `sessionId`."""
+    timings: Dict[str, float] = defaultdict(float)
+    session_id, session = register_assistant_session(req, timings)
+    if req.texts:
+        observe_keyword_stages("/assistant/context", len(req.texts), timings)
+    return AssistantSessionResponse(
+        sessionId=session_id,
+        expiresIn=ASSISTANT_SESSION_TTL_SECONDS,
+        texts=len(req.texts),
+        wordsNeg=len(session.ctx.words_neg),
+        wordsPos=len(session.ctx.words_pos),
+    )
+
+
+@app.post("/assistant/stream")
+async def assistant_stream(req: AssistantRequest):
+    """Mesma entrada do /assistant, respondida em Server-Sent Events (eventos draft, delta e final)."""
+    session = resolve_assistant_session(req)
+    return StreamingResponse(
+        assistant_events(req, session),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/assistant", response_model=AssistantResponse)
-def assistant(req: AssistantRequest):
-    ai_resp = call_gemini_chat(req)
+async def assistant(req: AssistantRequest):
+    session = resolve_assistant_session(req)
+    if ASSISTANT_SLO_SECONDS > 0:
+        return await answer_within_slo(req, session, ASSISTANT_SLO_SECONDS)
+    ai_resp = await call_gemini_chat(req, session=session)
     if ai_resp:
+        ASSISTANT_ANSWERS.inc("llm")
         return ai_resp
-    return build_answer(req)
+    ASSISTANT_ANSWERS.inc("local_fallback")
+    return build_answer(req, session)
+
+
+startup.mark("module")
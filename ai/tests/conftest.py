@@ -0,0 +1,36 @@
+"""Configuração comum dos testes do serviço de IA.
+
+Uso (a partir de `ai/`):
+
+    pip install -r requirements.txt -r tests/requirements.txt
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+# main lê o ambiente na importação: sem Gemini, sem armazém em disco, sem pool e sem fuzzy por padrão
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["RESULT_STORE_PATH"] = ""
+os.environ["KEYWORD_WORKERS"] = "0"
+os.environ["FUZZY_MATCH_THRESHOLD"] = "0"
+os.environ["EXTRACTION_SHARED_CACHE_MB"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import main
+from benchmarks import corpus as synth
+
+
+@pytest.fixture(autouse=True)
+def empty_result_caches():
+    main.extraction_cache.clear()
+    main.sentiment_cache.clear()
+    yield
+
+
+@pytest.fixture
+def feedback():
+    """Corpus sintético reprodutível (mesmo gerador dos benchmarks)."""
+    return [main.FeedbackText(**t) for t in synth.corpus(600, seed=7)]
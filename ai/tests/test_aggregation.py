@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def keyword_pool(monkeypatch):
+    monkeypatch.setattr(main, "KEYWORD_WORKERS", 2)
+    monkeypatch.setattr(main, "KEYWORD_PARALLEL_MIN_BATCH", 1)
+    yield main.start_keyword_pool()
+    main.shutdown_keyword_pool()
+
+
+def serial(texts, **kw):
+    return main.KeywordAggregator().consume(texts).response(**kw).model_dump()
+
+
+def test_columnar_aggregation_matches_a_plain_dict(feedback):
+    expected = {}
+    for t in feedback:
+        for kw, sc in main.extract_from_text(t.text):
+            data = expected.setdefault((t.week, t.categoryId, kw), [0, 0.0])
+            data[0] += 1
+            data[1] += sc
+    cols = main.KeywordAggregator().consume(feedback).columns()
+    got = {
+        (cols.weeks[w], cols.cats[c], cols.keywords[k]): [int(n), float(s)]
+        for w, c, k, n, s in zip(cols.week, cols.cat, cols.kw, cols.count, cols.score_sum)
+    }
+    assert got.keys() == expected.keys()
+    for key, (count, score_sum) in expected.items():
+        assert got[key][0] == count
+        assert got[key][1] == pytest.approx(score_sum)
+
+
+def test_parallel_aggregation_is_identical_to_serial(feedback, keyword_pool):
+    assert keyword_pool is not None
+    expected = serial(feedback, top=10000, min_freq=1, rank="global")
+    main.extraction_cache.clear()
+    timings = defaultdict(float)
+    got = main.aggregate_parallel(feedback, timings)
+    assert timings["parallel_extract"] > 0
+    # igualdade exata: mesmas somas de float e mesmo desempate do modo serial
+    assert got.response(10000, 1, "global").model_dump() == expected
+
+
+def test_parallel_aggregation_fills_and_reuses_the_extraction_cache(feedback, keyword_pool):
+    req = main.KeywordRequest(texts=feedback, top=10000)
+    first = main.aggregate_keywords(req).model_dump()
+    assert main.extraction_cache.stats()["size"] > 0
+    hits = main.extraction_cache.hits
+    assert main.aggregate_keywords(req).model_dump() == first
+    assert main.extraction_cache.hits - hits >= len({t.text for t in feedback if len(t.text.strip()) >= 3})
+
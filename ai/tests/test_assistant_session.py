@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def context(n=40):
+    return main.AssistantContext(
+        filters={"periodo": "2025"},
+        kpis={"nps": 42.0, "total": 1200.0},
+        series=[main.SeriesPoint(bucket=f"2025-W{i:02d}", avg=5 + (i % 7) * 0.3, count=30 + i) for i in range(n)],
+        volume=[main.SeriesPoint(bucket=f"2025-W{i:02d}", total=100 + (i * 37) % 90) for i in range(n)],
+        topics=[main.TopicPolarity(topic=f"tópico {i}", neg=i / n, neu=0.1, pos=1 - i / n, pneg=i) for i in range(n)],
+        words_neg=[main.HeatItem(week="2025-W01", keyword=f"ruim{i}", total=n - i, score=-0.5) for i in range(n)],
+        words_pos=[main.HeatItem(week="2025-W01", keyword=f"bom{i}", total=i, score=0.5) for i in range(n)],
+        worst_questions=[main.WorstQuestion(question=f"pergunta {i}", avg=i / 10, total=10) for i in range(n)],
+    )
+
+
+@pytest.mark.parametrize("intent", sorted(main.CONTEXT_PRIORITY))
+@pytest.mark.parametrize("budget", [120, 300, 1200])
+def test_packed_context_fits_the_token_budget(intent, budget):
+    session = main.AssistantSession(context())
+    blob = main.pack_assistant_context(session.ctx.kpis, session.ranked, intent, budget)
+    assert main.estimate_tokens(json.dumps(blob, ensure_ascii=False)) <= budget
+    for sec in main.CONTEXT_SECTIONS:
+        assert len(blob[sec]) + blob.get("omitted", {}).get(sec, 0) == len(session.ranked[sec])
+
+
+def test_budget_below_the_skeleton_sends_only_kpis_and_counts():
+    session = main.AssistantSession(context())
+    blob = main.pack_assistant_context(session.ctx.kpis, session.ranked, "resumo", 10)
+    assert all(blob[sec] == [] for sec in main.CONTEXT_SECTIONS)
+    assert blob["omitted"] == {sec: 40 for sec in main.CONTEXT_SECTIONS}
+
+
+def test_packing_keeps_series_chronological_and_prefers_the_intent_sections():
+    session = main.AssistantSession(context())
+    blob = main.pack_assistant_context(session.ctx.kpis, session.ranked, "keywords", 300)
+    buckets = [p["bucket"] for p in blob["series"]]
+    assert buckets == sorted(buckets)
+    # pontas da série entram primeiro
+    if buckets:
+        assert buckets[0] == "2025-W00"
+    assert len(blob["words_neg"]) > len(blob["volume"])
+    assert blob["words_neg"][0]["keyword"] == "ruim0"  # mais citada primeiro
+
+
+def test_everything_fits_without_omitted():
+    session = main.AssistantSession(context(3))
+    blob = main.pack_assistant_context(session.ctx.kpis, session.ranked, "resumo", 5000)
+    assert "omitted" not in blob
+    assert [p["bucket"] for p in blob["series"]] == ["2025-W00", "2025-W01", "2025-W02"]
+
+
+def test_session_is_registered_once_and_memoizes_each_intent(feedback):
+    req = main.AssistantSessionRequest(sessionId="s-1", context=context(5), texts=feedback[:200], top=10)
+    session_id, session = main.register_assistant_session(req)
+    assert session_id == "s-1"
+    expected = main.aggregate_keywords(main.KeywordRequest(texts=feedback[:200], top=10))
+    assert session.ctx.words_neg == expected.neg
+    resolved = main.resolve_assistant_session(main.AssistantRequest(question="resumo", sessionId="s-1"))
+    assert resolved is session
+    assert session.context_blob("resumo") is session.context_blob("resumo")
+    system, contents = main.build_chat_prompt("resumo", "resumo", session)
+    assert system == main.CHAT_PREAMBLES["resumo"]
+    assert json.dumps(session.context_blob("resumo"), ensure_ascii=False)[1:-1] in contents[0]["parts"][0]["text"]
+
+
+def test_unknown_session_is_404():
+    with pytest.raises(HTTPException) as exc:
+        main.resolve_assistant_session(main.AssistantRequest(question="oi", sessionId="não-existe"))
+    assert exc.value.status_code == 404
+
+
+def test_cache_key_keeps_quantifiers_and_word_order():
+    key = lambda q: main.assistant_cache_key("topics", q, "fp")
+    assert key("Qual tópico tem mais negativos?") != key("Qual tópico tem menos negativos?")
+    assert key("nota por categoria") != key("categoria por nota")
+    assert key("atendimento sem fila") != key("atendimento com fila")
+    assert key("Qual é a NOTA?") == key("qual e nota")
+
+
+def test_failed_local_answer_cancels_the_gemini_call(monkeypatch):
+    started = []
+
+    async def slow_gemini(req, session=None):
+        started.append(asyncio.current_task())
+        await asyncio.sleep(60)
+
+    def broken_answer(req, session):
+        raise RuntimeError("fallback quebrou")
+
+    monkeypatch.setattr(main, "call_gemini_chat", slow_gemini)
+    monkeypatch.setattr(main, "build_answer", broken_answer)
+    req = main.AssistantRequest(question="resumo", context=context())
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await main.answer_within_slo(req, main.AssistantSession(req.context), slo=5.0)
+        await asyncio.sleep(0)
+        # ainda dentro do loop: asyncio.run cancelaria sozinho as tarefas que sobrassem
+        assert started[0].cancelled()
+        assert not main.late_answers
+
+    asyncio.run(scenario())
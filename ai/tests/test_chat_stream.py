@@ -0,0 +1,58 @@
+import json
+import random
+
+import pytest
+
+import main
+
+ANSWER = {
+    "summary": 'NPS caiu para 42 ("queda" de 8%) \\ atenção às filas\n',
+    "insights": ["Fila é a palavra mais citada: 120×", "Emoji 🚀 e acentuação: ação, pão", ""],
+    "actions": ["Abrir um 2º caixa {piloto} até 30/06", "Medir [tempo] de espera"],
+    "extra": {"summary": "não é o campo de nível 1", "insights": ["ignorado"]},
+}
+
+
+def collect(chunks):
+    """Junta os deltas emitidos em (summary, insights, actions) como o frontend faz."""
+    parser = main.ChatJsonStream()
+    summary = ""
+    lists = {"insights": {}, "actions": {}}
+    for chunk in chunks:
+        for ev in parser.feed(chunk):
+            if ev["field"] == "summary":
+                assert ev["index"] is None
+                summary += ev["delta"]
+            else:
+                lists[ev["field"]][ev["index"]] = lists[ev["field"]].get(ev["index"], "") + ev["delta"]
+    return summary, lists
+
+
+def expected_lists(data):
+    return {f: {i: s for i, s in enumerate(data[f]) if s} for f in ("insights", "actions")}
+
+
+@pytest.mark.parametrize("ascii_only", [False, True])
+def test_stream_parser_matches_json_loads_under_any_chunking(ascii_only):
+    raw = "```json\n" + json.dumps(ANSWER, ensure_ascii=ascii_only, indent=1) + "\n```"
+    rng = random.Random(5)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(raw)), rng.randint(1, 40)))
+        chunks = [raw[a:b] for a, b in zip([0, *cuts], [*cuts, len(raw)])]
+        summary, lists = collect(chunks)
+        assert summary == ANSWER["summary"]
+        assert lists == expected_lists(ANSWER)
+
+
+def test_stream_parser_emits_before_the_json_closes():
+    parser = main.ChatJsonStream()
+    assert parser.feed('{"summary": "Volume ') == [{"field": "summary", "index": None, "delta": "Volume "}]
+    assert parser.feed('subiu", "insights": ["a') == [
+        {"field": "summary", "index": None, "delta": "subiu"},
+        {"field": "insights", "index": 0, "delta": "a"},
+    ]
+
+
+def test_stream_parser_replaces_lone_surrogates():
+    summary, _ = collect(['{"summary": "a\\ud83d b\\udc00"}'])
+    assert summary == "a\ufffd b\ufffd"
@@ -0,0 +1,169 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+
+def breaker(**kw):
+    params = dict(window=10, min_calls=4, error_rate=0.5, slow_seconds=1.0, open_seconds=30, max_open_seconds=100)
+    params.update(kw)
+    return main.CircuitBreaker(**params)
+
+
+def call(b, ok, seconds=0.01):
+    probe = b.acquire()
+    b.record(ok, seconds, probe)
+    return probe
+
+
+def test_breaker_opens_only_after_min_calls_at_the_error_rate():
+    b = breaker()
+    for _ in range(3):
+        call(b, False)
+    assert b.state == "closed"  # 100% de falha, mas abaixo de min_calls
+    b = breaker()
+    for ok in (True, True, True, False, False):
+        call(b, ok)
+    assert b.state == "closed"  # 2/5 abaixo da taxa
+    call(b, False)
+    assert b.state == "open"  # 3/6
+    assert b.trips == 1
+    with pytest.raises(main.CircuitOpenError):
+        b.acquire()
+
+
+def test_slow_calls_count_as_failures():
+    b = breaker(min_calls=2)
+    call(b, True, seconds=5.0)
+    call(b, True, seconds=5.0)
+    assert b.state == "open"
+
+
+def test_half_open_lets_one_probe_and_closes_on_success():
+    b = breaker(min_calls=1)
+    call(b, False)
+    b.retry_at = 0.0
+    assert b.acquire() is True
+    assert b.state == "half_open"
+    # só uma sonda por vez
+    with pytest.raises(main.CircuitOpenError):
+        b.acquire()
+    b.record(True, 0.01, probe=True)
+    assert b.state == "closed"
+    assert b.snapshot()["calls"] == 0
+    assert b.acquire() is False
+
+
+def test_failed_probe_reopens_with_a_longer_capped_wait():
+    b = breaker(min_calls=1, open_seconds=30, max_open_seconds=100)
+    call(b, False)
+    for expected in (60, 100, 100):
+        b.retry_at = 0.0
+        assert call(b, False) is True
+        assert b.state == "open"
+        assert b.cooldown == expected
+        # espera com jitter de ±20%
+        assert 0.8 * expected - 1 <= b.snapshot()["retryIn"] <= 1.2 * expected
+
+
+def test_calls_started_before_opening_do_not_decide_anything():
+    b = breaker(min_calls=1)
+    probe = b.acquire()
+    call(b, False)
+    assert b.state == "open"
+    b.record(True, 0.01, probe)
+    assert b.state == "open"
+
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_async(self, *a, **kw):
+        self.calls += 1
+        raise RuntimeError("503")
+
+
+def test_gemini_client_stops_calling_once_the_circuit_opens():
+    client = main.GeminiClient(2, 1.0, breaker(min_calls=3))
+    model = FailingModel()
+    client._models[("m", None)] = model
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await client.generate("m", [], {})
+        for _ in range(5):
+            with pytest.raises(main.CircuitOpenError):
+                await client.generate("m", [], {})
+
+    asyncio.run(run())
+    assert model.calls == 3
+
+
+class StreamingModel:
+    """Stream falso: `chunks` trechos de texto; `stall` faz o 1º trecho nunca chegar."""
+
+    def __init__(self, chunks=3, stall=False):
+        self.chunks = chunks
+        self.stall = stall
+
+    async def generate_content_async(self, *a, **kw):
+        async def gen():
+            if self.stall:
+                await asyncio.sleep(3600)
+            for i in range(self.chunks):
+                part = SimpleNamespace(text=f"t{i}")
+                yield SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+        if kw.get("stream"):
+            return gen()
+        await asyncio.sleep(3600)
+
+
+@pytest.mark.parametrize("stall", [False, True])
+def test_abandoned_streams_do_not_open_the_circuit(stall):
+    client = main.GeminiClient(2, 5.0, breaker(min_calls=3))
+    client._models[("m", None)] = StreamingModel(stall=stall)
+
+    async def abandon():
+        stream = client.stream("m", [], {})
+        if stall:
+            # cliente SSE desconecta antes do 1º trecho: a resposta é cancelada
+            task = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        else:
+            assert await stream.__anext__() == "t0"
+        await stream.aclose()
+
+    async def run():
+        for _ in range(5):
+            await abandon()
+
+    asyncio.run(run())
+    assert client.breaker.state == "closed"
+    assert client.breaker.snapshot()["errorRate"] == 0.0
+
+
+def test_cancelled_generate_is_neutral_and_frees_the_probe():
+    client = main.GeminiClient(2, 5.0, breaker(min_calls=1))
+    client._models[("m", None)] = StreamingModel()
+    client.breaker.record(False, 0.01, probe=False)
+    client.breaker.retry_at = 0.0
+
+    async def run():
+        task = asyncio.ensure_future(client.generate("m", [], {}))
+        await asyncio.sleep(0.01)
+        assert client.breaker.probing
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert client.breaker.state == "half_open"
+    assert client.breaker.acquire() is True
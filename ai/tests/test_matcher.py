@@ -0,0 +1,52 @@
+import random
+
+import main
+from benchmarks import corpus as synth
+
+
+def test_matcher_finds_the_same_patterns_as_substring_search():
+    rng = random.Random(1)
+    patterns = ["ab", "abc", "bc", "c", "bca", "aab", "cab", "abcab"]
+    matcher = main.LexiconMatcher(patterns)
+    for _ in range(500):
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 30)))
+        assert matcher.find(text) == {p for p in patterns if p in text}
+
+
+def test_matcher_with_the_service_lexicon_matches_substring_search():
+    lexicon = main.lexicons.current.keywords
+    patterns = list(lexicon._by_pattern)
+    for t in synth.corpus(200, seed=3):
+        norm = main.normalize(t["text"])
+        assert lexicon.matcher.find(norm) == {p for p in patterns if p in norm}
+
+
+def test_keyword_rules_keep_the_original_order_and_blocking():
+    lexicon = main.KeywordLexicon(
+        positive={"organizado": 0.6, "rapido": 0.5},
+        negative_strong={"pessimo": -0.9},
+        negative={"demora": -0.4, "fila": -0.3},
+        neutral={"fila"},
+        force_negative={"rapido"},
+    )
+    found = lexicon.match("atendimento pessimo, sem organizado e com demora, mas rapido na fila")
+    # "sem organizado" dispara a negação e bloqueia o positivo; neutros somem; force_negative inverte
+    assert found == [("falta de organizado", -0.6), ("rapido", -0.5), ("pessimo", -0.9), ("demora", -0.4)]
+    assert lexicon.match("nada a declarar") == []
+
+
+def test_extraction_keeps_the_strongest_score_per_keyword():
+    kws = main.extract_from_text("Atendimento PÉSSIMO e demorado")
+    assert kws == main.extract_from_normalized(main.normalize("Atendimento PÉSSIMO e demorado"))
+    assert len({kw for kw, _ in kws}) == len(kws)
+    assert all(abs(sc) >= 0.05 for _, sc in kws)
+    assert main.extract_from_text("ok") == ()
+
+
+def test_fuzzy_correction_picks_the_closest_term_not_the_first_alphabetically():
+    corrector = main.FuzzyCorrector(
+        ["disponibilidade", "indisponibilidade"], threshold=88, min_len=5, memo_size=100
+    )
+    # 96.77 x 96.97: arredondadas para inteiro as notas empatam e o argmax inverteria o sentido
+    assert corrector.correct("ndisponibilidade total") == "indisponibilidade total"
+    assert corrector.correct("disponibilidadee") == "disponibilidade"
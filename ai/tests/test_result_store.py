@@ -0,0 +1,110 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = main.ResultStore(str(tmp_path / "results.sqlite3"))
+    monkeypatch.setattr(main, "result_store", store)
+    return store
+
+
+def test_batched_lookup_filters_by_version(store):
+    n = main.ResultStore.LOOKUP_CHUNK * 2 + 7
+    store.put_many("enrich", [(f"id-{i}", "v1" if i % 2 else "v2", {"i": i}) for i in range(n)])
+    ids = [f"id-{i}" for i in range(n)] + ["id-1", "nope"]
+    assert store.get_many("enrich", ids) == {f"id-{i}": {"i": i} for i in range(n)}
+    assert set(store.get_many("enrich", ids, {"v1"})) == {f"id-{i}" for i in range(1, n, 2)}
+    assert store.get_many("keywords", ids) == {}
+    assert store.stats()["rows"] == {"enrich": n}
+
+
+def rows(res):
+    # empates seguem a ordem de chegada, que a edição muda; compara o conteúdo
+    key = lambda it: (it.week, it.categoryId or "", it.keyword, it.total, round(it.score, 9))
+    return {side: sorted(map(key, getattr(res, side))) for side in ("neg", "pos")}
+
+
+def test_rollups_warm_start_from_the_store(store, feedback):
+    before = main.KeywordRollups()
+    before.ingest(feedback)
+    # reenvio de um texto editado sobrescreve a linha no armazém
+    edited = main.FeedbackText(**{**feedback[0].model_dump(), "text": "fila enorme e atendimento péssimo"})
+    assert before.ingest([edited])["updated"] == 1
+    after = main.KeywordRollups()
+    assert after.warm_start(store) == len(feedback)
+    query = dict(week_from=None, week_to=None, category_ids=None, top=1000, min_freq=1)
+    assert rows(after.query(**query)) == rows(before.query(**query))
+    assert after.stats() == before.stats()
+
+
+def test_warm_start_skips_rows_from_another_lexicon(store, feedback):
+    main.KeywordRollups().ingest(feedback[:10])
+    store.put_many("keywords", [("old", "outra-versao", {"week": "2025-W01", "keywords": [["fila", -0.4]]})])
+    assert main.KeywordRollups().warm_start(store) == 10
+
+
+def drain(store):
+    """Espera o gravador em segundo plano terminar o que já foi enfileirado."""
+    store._writer.submit(lambda: None).result()
+    store.flush()
+
+
+def test_latest_rows_come_back_in_write_order(store):
+    store.put_many("text_sentiment", [(f"{i:032x}", "v1", i / 10) for i in range(10)])
+    store.put_many("text_sentiment", [(f"{3:032x}", "v1", 0.99)])
+    assert [score for _, score in store.iter_kind("text_sentiment", "v1", limit=3)] == [0.8, 0.9, 0.99]
+    assert len(store.iter_kind("text_sentiment", "v1")) == 10
+
+
+def test_extractions_are_written_behind_and_warm_the_cache_after_a_restart(store, feedback, monkeypatch):
+    req = main.KeywordRequest(texts=feedback, top=1000)
+    first = main.aggregate_keywords(req).model_dump()
+    drain(store)
+    distinct = {main.normalize(t.text) for t in feedback if len(t.text.strip()) >= 3}
+    assert store.stats()["rows"]["text_keywords"] == len(distinct)
+
+    main.extraction_cache.clear()
+    assert main.warm_result_caches(store)[0] == len(distinct)
+    monkeypatch.setattr(main, "extract_from_normalized", lambda *a: pytest.fail("extração refeita"))
+    assert main.aggregate_keywords(req).model_dump() == first
+
+
+def test_texts_sharing_a_feedback_id_are_stored_separately(store):
+    # o backend manda o mesmo id para todas as respostas de texto de um feedback
+    texts = [
+        main.FeedbackText(id="fb1", text="atendimento péssimo", week="2025-W01"),
+        main.FeedbackText(id="fb1", text="fila demorada", week="2025-W01"),
+    ]
+    main.aggregate_keywords(main.KeywordRequest(texts=texts))
+    main.sentiment(main.SentimentRequest(texts=[main.SentimentText(id=t.id, text=t.text) for t in texts]))
+    drain(store)
+    assert store.stats()["rows"] == {"text_keywords": 2, "text_sentiment": 2}
+
+
+def test_sentiment_is_scored_once_per_text(store, monkeypatch):
+    texts = [main.SentimentText(id="1", text="atendimento ótimo"), main.SentimentText(id="2", text="péssimo")]
+    first = main.sentiment(main.SentimentRequest(texts=texts))
+    drain(store)
+    main.sentiment_cache.clear()
+    assert main.warm_result_caches(store)[1] == 2
+    monkeypatch.setattr(main, "compute_sentiment_batch", lambda texts: pytest.fail("sentimento refeito"))
+    assert main.sentiment(main.SentimentRequest(texts=texts)) == first
+
+
+def test_fuzzy_settings_change_the_version_of_stored_results(store, monkeypatch):
+    previous = main.lexicons.current
+    text = [main.FeedbackText(id="1", text="setor muito desorganisado", week="2025-W01")]
+    assert main.aggregate_keywords(main.KeywordRequest(texts=text)).neg == []
+    monkeypatch.setattr(main, "FUZZY_MATCH_THRESHOLD", 85.0)
+    fuzzy = main.Lexicon(previous.data)
+    assert fuzzy.version != previous.version
+    monkeypatch.setattr(main, "FUZZY_MIN_TOKEN_LEN", 4)
+    assert main.Lexicon(previous.data).version != fuzzy.version
+    main.lexicons.install(fuzzy)
+    try:
+        res = main.aggregate_keywords(main.KeywordRequest(texts=text))
+    finally:
+        main.lexicons.install(previous)
+    assert [it.keyword for it in res.neg] == ["desorganizado"]
@@ -0,0 +1,84 @@
+"""Pré-processamento de texto compartilhado pelo serviço de IA.
+
+Concentra a normalização (minúsculas + remoção de acentos) e a regex de palavras para que
+keywords, sentimento, intenção e cache do assistente usem exatamente a mesma forma do texto.
+A remoção de acentos usa uma tabela `str.translate` para a faixa Latin-1 (o caso comum em
+português) e só recorre ao unidecode quando sobra algum caractere fora do ASCII.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Union
+
+from unidecode import unidecode
+
+# Textos até este tamanho passam pelo memo (perguntas, keywords, termos de léxico); 0 desliga.
+TEXT_MEMO_MAX_LEN = int(os.environ.get("TEXT_MEMO_MAX_LEN", "128"))
+TEXT_MEMO_SIZE = int(os.environ.get("TEXT_MEMO_SIZE", "20000"))
+
+# Mesma saída do unidecode, caractere a caractere, para U+0080..U+00FF.
+LATIN1_FOLD = str.maketrans({chr(cp): unidecode(chr(cp)) for cp in range(0x80, 0x100)})
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Remove acentos como o unidecode, mas pela tabela Latin-1 quando possível."""
+    folded = text.translate(LATIN1_FOLD)
+    return folded if folded.isascii() else unidecode(folded)
+
+
+def _normalize(text: str) -> str:
+    return fold(text.lower().strip())
+
+
+_normalize_memo = lru_cache(maxsize=TEXT_MEMO_SIZE)(_normalize)
+
+
+def normalize(text: Optional[str]) -> str:
+    """Minúsculas, sem espaços nas pontas e sem acentos (equivalente a unidecode(text.lower().strip()))."""
+    if not text:
+        return ""
+    if len(text) <= TEXT_MEMO_MAX_LEN:
+        return _normalize_memo(text)
+    return _normalize(text)
+
+
+class NormalizedText:
+    """Texto original + forma normalizada, com tokens calculados sob demanda e reaproveitados."""
+
+    __slots__ = ("raw", "text", "_words")
+
+    def __init__(self, raw: Optional[str]):
+        self.raw = raw or ""
+        self.text = normalize(self.raw)
+        self._words: Optional[List[str]] = None
+
+    @property
+    def words(self) -> List[str]:
+        if self._words is None:
+            self._words = WORD_RE.findall(self.text)
+        return self._words
+
+
+def prepare(text: Union[str, NormalizedText, None]) -> NormalizedText:
+    """Aceita texto cru ou já normalizado; nunca normaliza duas vezes o mesmo objeto."""
+    if isinstance(text, NormalizedText):
+        return text
+    return NormalizedText(text)
+
+
+def memo_stats() -> dict:
+    """Mesmo formato de LRUCache.stats() para expor o memo nas métricas."""
+    info = _normalize_memo.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_ratio": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
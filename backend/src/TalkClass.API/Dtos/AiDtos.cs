@@ -31,6 +31,14 @@ public sealed class AiAssistantRequestDto
     public AiAssistantContextDto Context { get; set; } = new();
 }
 
+public sealed class AiAssistantSessionRequestDto
+{
+    public string SessionId { get; set; } = "";
+    public AiAssistantContextDto Context { get; set; } = new();
+    public List<AiTextDto> Texts { get; set; } = new();
+    public int Top { get; set; } = 32;
+}
+
 public sealed class AiAssistantContextDto
 {
     public Dictionary<string, string?> Filters { get; set; } = new();
@@ -38,8 +46,12 @@ public sealed class AiAssistantContextDto
     public List<SeriesPointDto> Series { get; set; } = new();
     public List<VolumePointDto> Volume { get; set; } = new();
     public List<TopicsPolarityRowDto> Topics { get; set; } = new();
+    // o service de IA usa snake_case nestes campos
+    [JsonPropertyName("words_neg")]
     public List<AiHeatItemDto> WordsNeg { get; set; } = new();
+    [JsonPropertyName("words_pos")]
     public List<AiHeatItemDto> WordsPos { get; set; } = new();
+    [JsonPropertyName("worst_questions")]
     public List<AiWorstQuestionDto> WorstQuestions { get; set; } = new();
 }
 
@@ -1,6 +1,7 @@
 using Microsoft.EntityFrameworkCore;
 using TalkClass.Infrastructure.Persistence;
 using System.Globalization;
+using System.Security.Cryptography;
 using System.Text;
 using System.Text.RegularExpressions;
 using Npgsql;
@@ -953,6 +954,27 @@ g.MapGet("/topics-polarity", async (DateTime? from, DateTime? to, Guid? category
             CancellationToken ct) =>
         {
             var (inicio, fim) = Range(body.From, body.To, 30);
+            var question = body.Question ?? "";
+
+            var filtersRaw = new Dictionary<string, string?>
+            {
+                ["from"] = body.From?.ToString("yyyy-MM-dd"),
+                ["to"] = body.To?.ToString("yyyy-MM-dd"),
+                ["categoryId"] = body.CategoryId?.ToString(),
+                ["curso"] = body.Curso,
+                ["turno"] = body.Turno,
+                ["unidade"] = body.Unidade,
+                ["identified"] = body.Identified?.ToString()
+            };
+            var filters = filtersRaw
+                .Where(kv => !string.IsNullOrWhiteSpace(kv.Value))
+                .ToDictionary(kv => kv.Key, kv => kv.Value);
+
+            // Mesmo conjunto de filtros (e mesmo período) => mesma sessão no service de IA.
+            var sessionId = AssistantSessionId(filters, inicio, fim);
+            var cached = await ai.AskAssistantInSessionAsync(sessionId, question, ct);
+            if (cached is not null)
+                return Results.Ok(cached);
 
             var fbQ = db.Feedbacks.AsNoTracking()
                 .Where(f => f.CriadoEm >= inicio && f.CriadoEm <= fim);
@@ -1090,47 +1112,46 @@ g.MapGet("/topics-polarity", async (DateTime? from, DateTime? to, Guid? category
                 CategoryId = r.CategoriaId
             }).ToList();
 
-            var aiKw = aiTexts.Count > 0
-                ? await ai.ExtractKeywordsAsync(aiTexts, 32, ct)
-                : new AiKeywordResponseDto();
-
-            var filtersRaw = new Dictionary<string, string?>
+            var context = new AiAssistantContextDto
             {
-                ["from"] = body.From?.ToString("yyyy-MM-dd"),
-                ["to"] = body.To?.ToString("yyyy-MM-dd"),
-                ["categoryId"] = body.CategoryId?.ToString(),
-                ["curso"] = body.Curso,
-                ["turno"] = body.Turno,
-                ["unidade"] = body.Unidade,
-                ["identified"] = body.Identified?.ToString()
+                Filters = filters,
+                Kpis = new AiKpiDto
+                {
+                    Nps = nps,
+                    TotalFeedbacks = totalFeedbacks,
+                    AreasComAlerta = areasComAlerta,
+                    TotalAreas = totalAreas
+                },
+                Series = series,
+                Volume = volume,
+                Topics = topics,
+                WorstQuestions = worstQuestions
             };
-            var filters = filtersRaw
-                .Where(kv => !string.IsNullOrWhiteSpace(kv.Value))
-                .ToDictionary(kv => kv.Key, kv => kv.Value);
 
-            var aiReq = new AiAssistantRequestDto
+            // Registra o contexto uma vez: o service extrai as keywords dos textos e guarda os derivados.
+            var registered = await ai.RegisterAssistantSessionAsync(new AiAssistantSessionRequestDto
             {
-                Question = body.Question ?? "",
-                Context = new AiAssistantContextDto
-                {
-                    Filters = filters,
-                    Kpis = new AiKpiDto
-                    {
-                        Nps = nps,
-                        TotalFeedbacks = totalFeedbacks,
-                        AreasComAlerta = areasComAlerta,
-                        TotalAreas = totalAreas
-                    },
-                    Series = series,
-                    Volume = volume,
-                    Topics = topics,
-                    WorstQuestions = worstQuestions,
-                    WordsNeg = aiKw.Neg,
-                    WordsPos = aiKw.Pos
-                }
-            };
+                SessionId = sessionId,
+                Context = context,
+                Texts = aiTexts,
+                Top = 32
+            }, ct);
 
-            var aiResp = await ai.AskAssistantAsync(aiReq, ct);
+            AiAssistantResponseDto? aiResp = null;
+            if (registered)
+                aiResp = await ai.AskAssistantInSessionAsync(sessionId, question, ct);
+
+            if (aiResp is null)
+            {
+                // sessão não registrada ou perdida (outro worker do service, expirou, service sem sessões):
+                // fluxo completo (keywords + contexto inteiro nesta mensagem)
+                var aiKw = aiTexts.Count > 0
+                    ? await ai.ExtractKeywordsAsync(aiTexts, 32, ct)
+                    : new AiKeywordResponseDto();
+                context.WordsNeg = aiKw.Neg;
+                context.WordsPos = aiKw.Pos;
+                aiResp = await ai.AskAssistantAsync(new AiAssistantRequestDto { Question = question, Context = context }, ct);
+            }
             aiResp ??= new AiAssistantResponseDto
             {
                 Answer = "Assistente temporariamente indisponível. Tente novamente em instantes.",
@@ -1198,6 +1219,14 @@ public sealed class WordHeatmapRow
 
     private static DateTime WeekBucket(DateTime dt) => dt.Date.AddDays(-(int)dt.Date.DayOfWeek).Date;
 
+    // Chave da sessão do assistente no service de IA: filtros + período (em dias).
+    private static string AssistantSessionId(IDictionary<string, string?> filters, DateTime inicio, DateTime fim)
+    {
+        var raw = string.Join("|", filters.OrderBy(kv => kv.Key, StringComparer.Ordinal).Select(kv => $"{kv.Key}={kv.Value}"))
+            + $"|{inicio:yyyy-MM-dd}|{fim:yyyy-MM-dd}";
+        return "dashboard-" + Convert.ToHexString(SHA256.HashData(Encoding.UTF8.GetBytes(raw)))[..24].ToLowerInvariant();
+    }
+
     private static readonly HashSet<string> CriticalWords = new(StringComparer.OrdinalIgnoreCase)
     {
         "ruim", "péssimo", "horrível", "terrível", "insuportável", "inaceitável",
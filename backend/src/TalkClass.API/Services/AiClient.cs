@@ -1,3 +1,4 @@
+using System.Net;
 using System.Net.Http.Json;
 using Microsoft.Extensions.Options;
 using TalkClass.API.Dtos;
@@ -64,4 +65,37 @@ public class AiClient
             return null;
         }
     }
+
+    public async Task<bool> RegisterAssistantSessionAsync(AiAssistantSessionRequestDto dto, CancellationToken ct)
+    {
+        try
+        {
+            var resp = await _http.PostAsJsonAsync("assistant/context", dto, cancellationToken: ct);
+            resp.EnsureSuccessStatusCode();
+            return true;
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Falha ao registrar o contexto do assistente no service de IA");
+            return false;
+        }
+    }
+
+    // Pergunta usando uma sessão já registrada; null se a sessão expirou (registre de novo) ou em caso de erro.
+    public async Task<AiAssistantResponseDto?> AskAssistantInSessionAsync(string sessionId, string question, CancellationToken ct)
+    {
+        try
+        {
+            var resp = await _http.PostAsJsonAsync("assistant", new { question, sessionId }, cancellationToken: ct);
+            if (resp.StatusCode == HttpStatusCode.NotFound)
+                return null;
+            resp.EnsureSuccessStatusCode();
+            return await resp.Content.ReadFromJsonAsync<AiAssistantResponseDto>(cancellationToken: ct);
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Falha ao consultar o service de IA para assistant/chatbot (sessão)");
+            return null;
+        }
+    }
 }